@@ -1,10 +1,19 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
+import asyncio
 import json
-from student_registration_prediction_system import StudentRegistrationPredictor
+import time
+import numpy as np
+from model_registry import ModelRegistry
+from response_encoding import EncodedResponseCache, encoded_response, make_cache_key
+from profiling import PredictionProfiler
+from choropleth import build_choropleth, load_district_geometry
+from training_jobs import FINISHED_STATES, TrainingJobManager
+from student_registration_prediction_system import PREDICTION_YEAR_RANGE
 
 app = FastAPI(title="Student Registration Prediction API")
 
@@ -15,15 +24,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Model-Version"],
 )
 
-# Initialize predictor
-predictor = StudentRegistrationPredictor()
-predictor.load_model()  # Load the trained model
+# Versioned models, loaded lazily (see model_registry.py for the environment switches)
+registry = ModelRegistry.from_env()
+if registry.default_version is not None:
+    registry.get()  # Load the default model up front
+
+# Encoded response bodies keyed by ETag (model fingerprint + request parameters)
+response_cache = EncodedResponseCache()
+
+# Background training; promoted models are loaded straight into the registry
+training_jobs = TrainingJobManager(registry, on_promote=registry.get)
+
+# Opt-in request profiling (see profiling.py for the environment switches)
+profiler = PredictionProfiler.from_env()
+
+# Read and simplify the map geometry now, so a missing file stops startup
+load_district_geometry()
+
+YEAR_FIELD = dict(ge=PREDICTION_YEAR_RANGE[0], le=PREDICTION_YEAR_RANGE[1])
+MONTH_FIELD = dict(ge=1, le=12)
 
 class PredictionRequest(BaseModel):
-    year: int
-    month: int
+    year: int = Field(..., **YEAR_FIELD)
+    month: int = Field(..., **MONTH_FIELD)
+    model_version: Optional[str] = None
 
 class PredictionResponse(BaseModel):
     districts: List[str]
@@ -31,36 +58,281 @@ class PredictionResponse(BaseModel):
     percentages: List[float]
     timestamp: str
 
+class ScenarioRequest(BaseModel):
+    year: int = Field(..., **YEAR_FIELD)
+    month: Optional[int] = Field(None, **MONTH_FIELD)
+    model_version: Optional[str] = None
+    # Scenario name -> feature overrides (a single value or a per-district mapping)
+    scenarios: Dict[str, Dict[str, Union[float, Dict[str, float]]]]
+
+class ScenarioResult(BaseModel):
+    name: str
+    predicted_registrations: int
+    baseline_registrations: int
+    delta: int
+    delta_pct: float
+    districts: Dict[str, int]
+    district_deltas: Dict[str, int]
+
+class ScenarioResponse(BaseModel):
+    scenarios: List[ScenarioResult]
+    timestamp: str
+
+class TrainingJobRequest(BaseModel):
+    years: int = Field(5, ge=1, le=20)
+    records_per_month: int = Field(100, ge=1)
+    version: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_.-]+$")
+    # Serve the new model for unpinned traffic once training succeeds
+    promote: bool = False
+    # Override the default hyperparameter grid (e.g. for a quick trial run);
+    # bool comes first so true/false are not coerced to 1/0
+    param_grid: Optional[Dict[str, List[Union[bool, int, float, str, None]]]] = None
+    # Train one model per district category or per program instead of a single forest
+    segment_by: Optional[str] = Field(None, pattern=r"^(district_category|program)$")
+
+@app.on_event("shutdown")
+def stop_training_jobs():
+    training_jobs.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "Student Registration Prediction API"}
 
+def _resolve_predictor(model_version: Optional[str]):
+    version = registry.choose_version(model_version)
+    try:
+        return registry.get(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+def _profiling_on_request(profile) -> bool:
+    # Header-triggered profiles investigate a specific call, so they must run the model
+    return profile is not None and profile.trigger == 'header'
+
+def _district_prediction_payload(predictor, year: int, month: int) -> dict:
+    # Get predictions for the specified year and month
+    _, district_summary = predictor.predict_registrations_compact(year, month)
+    
+    # Sort districts by predictions for consistency
+    order = np.argsort(-district_summary['predicted_registrations'], kind='stable')
+    district_summary_sorted = district_summary[order]
+    
+    # Calculate total predictions and percentages
+    predictions = district_summary_sorted['predicted_registrations'].tolist()
+    total_predictions = sum(predictions)
+    percentages = [(count / total_predictions) * 100 for count in predictions]
+    
+    # District names are attached only here, at the response edge
+    return {
+        "districts": [predictor.districts[code] for code in district_summary_sorted['district']],
+        "predictions": predictions,
+        "percentages": [round(p, 1) for p in percentages],
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _district_totals(predictor, year: int, month: Optional[int]) -> np.ndarray:
+    _, district_summary = predictor.predict_registrations_compact(year, month)
+    return np.bincount(
+        district_summary['district'], weights=district_summary['predicted_registrations'],
+        minlength=len(predictor.districts)
+    )
+
+def _run_shadows(served_version: str, shadow_versions: List[str], year: int, month: int):
+    # Predictions are deterministic, so recomputing the served totals matches what was sent
+    served = _district_totals(registry.get(served_version), year, month)
+    for version in shadow_versions:
+        try:
+            started = time.perf_counter()
+            totals = _district_totals(registry.get(version), year, month)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            registry.record_shadow(version, elapsed_ms, float(np.abs(totals - served).mean()))
+        except Exception as e:
+            print(f"⚠️  Shadow evaluation of model '{version}' failed: {e}")
+
+def _prediction_response(year: int, month: int, model_version: Optional[str], http_request: Request,
+                         background_tasks: BackgroundTasks):
+    predictor = _resolve_predictor(model_version)
+    cache_key = make_cache_key(predictor.model_fingerprint, "predict", year, month)
+    shadows = registry.choose_shadows(predictor.model_version)
+    if shadows:
+        background_tasks.add_task(_run_shadows, predictor.model_version, shadows, year, month)
+    try:
+        with registry.track(predictor.model_version), \
+                profiler.maybe_profile(http_request.headers, f"predict {year}-{month:02d}") as profile:
+            return encoded_response(
+                response_cache, cache_key, http_request.headers,
+                lambda: _district_prediction_payload(predictor, year, month),
+                extra_headers={"X-Model-Version": predictor.model_version},
+                refresh=_profiling_on_request(profile)
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_registrations(request: PredictionRequest):
+async def predict_registrations(request: PredictionRequest, http_request: Request, background_tasks: BackgroundTasks):
+    return _prediction_response(request.year, request.month, request.model_version, http_request, background_tasks)
+
+@app.get("/predict", response_model=PredictionResponse)
+async def get_predictions(http_request: Request, background_tasks: BackgroundTasks,
+                          year: int = Query(..., **YEAR_FIELD), month: int = Query(..., **MONTH_FIELD),
+                          model_version: Optional[str] = None):
+    # Cacheable variant of POST /predict: browsers revalidate GETs with If-None-Match
+    return _prediction_response(year, month, model_version, http_request, background_tasks)
+
+def _map_payload(predictor, year: int, month: Optional[int]) -> dict:
+    # Yearly maps sum the twelve monthly rows per district
+    totals = _district_totals(predictor, year, month)
+    payload = build_choropleth(
+        load_district_geometry(),
+        {district: int(count) for district, count in zip(predictor.districts, totals)}
+    )
+    payload["period"] = {"year": year, "month": month, "period_type": "monthly" if month else "yearly"}
+    payload["timestamp"] = datetime.now().isoformat()
+    return payload
+
+@app.get("/map")
+async def get_map(http_request: Request, year: int = Query(..., **YEAR_FIELD),
+                  month: Optional[int] = Query(None, **MONTH_FIELD), model_version: Optional[str] = None):
+    # Pre-joined, pre-binned district map; cached per model version and period
+    predictor = _resolve_predictor(model_version)
+    cache_key = make_cache_key(predictor.model_fingerprint, "map", year, month)
+    try:
+        with registry.track(predictor.model_version), \
+                profiler.maybe_profile(http_request.headers, f"map {year}-{month or 'all'}") as profile:
+            return encoded_response(
+                response_cache, cache_key, http_request.headers,
+                lambda: _map_payload(predictor, year, month),
+                extra_headers={"X-Model-Version": predictor.model_version},
+                refresh=_profiling_on_request(profile)
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _scenario_payload(predictor, request: ScenarioRequest) -> dict:
+    district_results, scenario_summary = predictor.predict_scenarios(
+        request.scenarios, request.year, request.month
+    )
+    
+    results = []
+    for row in scenario_summary.itertuples(index=False):
+        per_district = district_results[district_results['scenario'] == row.scenario]
+        results.append({
+            "name": row.scenario,
+            "predicted_registrations": int(row.predicted_registrations),
+            "baseline_registrations": int(row.baseline_registrations),
+            "delta": int(row.delta),
+            "delta_pct": float(row.delta_pct),
+            "districts": dict(zip(per_district['district'], per_district['predicted_registrations'].astype(int).tolist())),
+            "district_deltas": dict(zip(per_district['district'], per_district['delta'].astype(int).tolist()))
+        })
+    
+    return {
+        "scenarios": results,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/predict/scenarios", response_model=ScenarioResponse)
+async def predict_scenarios(request: ScenarioRequest, http_request: Request):
+    predictor = _resolve_predictor(request.model_version)
+    cache_key = make_cache_key(predictor.model_fingerprint, "scenarios", request.model_dump(exclude={"model_version"}))
     try:
-        # Get predictions for the specified year and month
-        _, district_summary = predictor.predict_registrations(request.year, request.month)
-        
-        # Sort districts by predictions for consistency
-        district_summary_sorted = district_summary.sort_values('predicted_registrations', ascending=False)
-        
-        # Calculate total predictions and percentages
-        total_predictions = district_summary_sorted['predicted_registrations'].sum()
-        
-        # Prepare response data
-        districts = district_summary_sorted['district'].tolist()
-        predictions = district_summary_sorted['predicted_registrations'].tolist()
-        percentages = [(count / total_predictions) * 100 for count in predictions]
-        
-        return {
-            "districts": districts,
-            "predictions": predictions,
-            "percentages": [round(p, 1) for p in percentages],
-            "timestamp": datetime.now().isoformat()
-        }
+        with registry.track(predictor.model_version), \
+                profiler.maybe_profile(http_request.headers, f"scenarios {request.year}") as profile:
+            return encoded_response(
+                response_cache, cache_key, http_request.headers,
+                lambda: _scenario_payload(predictor, request),
+                extra_headers={"X-Model-Version": predictor.model_version},
+                refresh=_profiling_on_request(profile)
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/models")
+async def list_models():
+    return {"default_version": registry.default_version, "models": registry.describe()}
+
+@app.post("/models/refresh")
+async def refresh_models():
+    return {"versions": registry.discover()}
+
+@app.post("/training/jobs", status_code=202)
+async def start_training_job(request: TrainingJobRequest):
+    try:
+        job = training_jobs.start(**request.model_dump())
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.as_dict()
+
+@app.get("/training/jobs")
+async def list_training_jobs():
+    return {"jobs": training_jobs.list()}
+
+def _get_training_job(job_id: int):
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@app.get("/training/jobs/{job_id}")
+async def get_training_job(job_id: int):
+    return _get_training_job(job_id).as_dict()
+
+@app.get("/training/jobs/{job_id}/progress")
+async def stream_training_progress(job_id: int, interval: float = 1.0):
+    job = _get_training_job(job_id)
+    
+    async def events():
+        # Newline-delimited JSON snapshots until the job reaches a final state
+        while True:
+            snapshot = job.as_dict()
+            yield json.dumps(snapshot) + "\n"
+            if snapshot["status"] in FINISHED_STATES:
+                break
+            await asyncio.sleep(max(interval, 0.2))
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.delete("/training/jobs/{job_id}")
+def cancel_training_job(job_id: int):
+    # Plain def: stopping the process tree waits for it, so run in the threadpool
+    _get_training_job(job_id)
+    return training_jobs.cancel(job_id).as_dict()
+
+def _require_profile_admin(http_request: Request):
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiler.authorized(http_request.headers):
+        raise HTTPException(status_code=403, detail="A valid X-Admin-Token header is required")
+
+@app.get("/admin/profiles")
+async def list_profiles(http_request: Request):
+    _require_profile_admin(http_request)
+    return {"profiles": profiler.list()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: int, http_request: Request, format: str = "json"):
+    _require_profile_admin(http_request)
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "prof":
+        # Raw pstats dump, loadable with pstats/snakeviz
+        return Response(
+            content=profile.dump(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'}
+        )
+    return {**profile.summary(), "top_functions": profile.top_functions()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
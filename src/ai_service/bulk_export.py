@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+🗂️ BULK PREDICTION EXPORT
+Headless, parallel regeneration of the dashboard prediction files
+
+Writes ``predictions_YYYY_MM.json`` (and optionally ``predictions_YYYY.json``)
+for every period in a year/month range, plus ``district_predictions_map_data.json``.
+Periods are spread across a process pool that shares one loaded model, and
+files already produced by the current model fingerprint are skipped.
+
+Example:
+    python bulk_export.py --start 2025-01 --end 2030-12 --yearly
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from student_registration_prediction_system import PREDICTION_YEAR_RANGE, StudentRegistrationPredictor
+
+MAP_DATA_FILENAME = 'district_predictions_map_data.json'
+
+# Model shared by every worker in the pool (inherited on fork, loaded once otherwise)
+_predictor = None
+
+
+def _init_worker(model_path):
+    """Load the model once per worker process unless it was inherited from the parent"""
+    global _predictor
+    if _predictor is None:
+        _predictor = StudentRegistrationPredictor()
+        _predictor.load_model(model_path)
+    # Parallelism comes from the pool; keep each forest single-threaded
+    _predictor.model.n_jobs = 1
+
+
+def _predict_period(year, month):
+    """Worker task: district totals for a single month"""
+    _, district_summary = _predictor.predict_registrations_compact(year=year, month=month)
+    return year, month, {
+        _predictor.districts[code]: int(count)
+        for code, count in zip(district_summary['district'], district_summary['predicted_registrations'])
+    }
+
+
+def parse_period(value):
+    """Parse a ``YYYY-MM`` (or bare ``YYYY``) command line period"""
+    try:
+        if '-' in value:
+            year, month = value.split('-', 1)
+            year, month = int(year), int(month)
+        else:
+            year, month = int(value), None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid period '{value}', expected YYYY-MM or YYYY")
+    if month is not None and not 1 <= month <= 12:
+        raise argparse.ArgumentTypeError(f"Invalid month in '{value}', expected 1-12")
+    low, high = PREDICTION_YEAR_RANGE
+    if not low <= year <= high:
+        raise argparse.ArgumentTypeError(f"Invalid year in '{value}', expected {low}-{high}")
+    return year, month
+
+
+def expand_periods(start, end):
+    """List every (year, month) between two inclusive periods"""
+    start_year, start_month = start
+    end_year, end_month = end
+    start_month = start_month or 1
+    end_month = end_month or 12
+
+    periods = []
+    year, month = start_year, start_month
+    while (year, month) <= (end_year, end_month):
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def period_filename(year, month=None):
+    """File name used by the dashboard for a prediction period"""
+    filename = f"predictions_{year}"
+    if month:
+        filename += f"_{month:02d}"
+    return filename + ".json"
+
+
+def build_dashboard_payload(totals, year, month, fingerprint):
+    """Same layout as ``test_predictions.save_results_for_dashboard`` plus the model fingerprint"""
+    total_predicted = sum(totals.values())
+    districts = [
+        {
+            'name': district,
+            'predicted_registrations': count,
+            'percentage': round((count / total_predicted) * 100, 1) if total_predicted > 0 else 0
+        }
+        for district, count in totals.items()
+    ]
+    return {
+        'prediction_date': datetime.now().isoformat(),
+        'prediction_period': {
+            'year': year,
+            'month': month,
+            'period_type': 'monthly' if month else 'yearly'
+        },
+        'model_fingerprint': fingerprint,
+        'districts': sorted(districts, key=lambda x: x['predicted_registrations'], reverse=True)
+    }
+
+
+def build_map_payload(totals, year, fingerprint):
+    """Same layout as the map file written by the training script plus the model fingerprint"""
+    ordered = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    total_predicted = sum(totals.values())
+    return {
+        'year': year,
+        'model_fingerprint': fingerprint,
+        'districts': [district for district, _ in ordered],
+        'predictions': [count for _, count in ordered],
+        'percentages': [
+            round((count / total_predicted) * 100, 1) if total_predicted > 0 else 0
+            for _, count in ordered
+        ]
+    }
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file in the target directory and rename it into place"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def is_current(path, fingerprint, **expected):
+    """True if ``path`` exists and was produced by the model with ``fingerprint``"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if data.get('model_fingerprint') != fingerprint:
+        return False
+    return all(data.get(key) == value for key, value in expected.items())
+
+
+def export_predictions(periods, model_path='student_registration_model.pkl', output_dir='.',
+                       yearly=False, map_year=None, workers=None, force=False):
+    """
+    Regenerate dashboard prediction files for ``periods``
+
+    Returns a dict with the lists of written and skipped file paths.
+    """
+    global _predictor
+
+    _predictor = StudentRegistrationPredictor()
+    _predictor.load_model(model_path)
+    fingerprint = _predictor.model_fingerprint
+    os.makedirs(output_dir, exist_ok=True)
+
+    months_by_year = {}
+    for year, month in periods:
+        months_by_year.setdefault(year, set()).add(month)
+
+    map_path = os.path.join(output_dir, MAP_DATA_FILENAME)
+    map_skipped = map_year is not None and not force and is_current(map_path, fingerprint, year=map_year)
+    if map_skipped:
+        map_year = None
+
+    # Work out which monthly results are actually needed
+    needed = set()
+    for year, month in periods:
+        monthly_path = os.path.join(output_dir, period_filename(year, month))
+        if force or not is_current(monthly_path, fingerprint):
+            needed.add((year, month))
+    if yearly:
+        for year in months_by_year:
+            yearly_path = os.path.join(output_dir, period_filename(year))
+            if len(months_by_year[year]) == 12 and (force or not is_current(yearly_path, fingerprint)):
+                needed.update((year, month) for month in range(1, 13))
+    if map_year is not None:
+        needed.update((map_year, month) for month in range(1, 13))
+
+    results = {}
+    if needed:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path,)) as pool:
+            futures = [pool.submit(_predict_period, year, month) for year, month in sorted(needed)]
+            for future in as_completed(futures):
+                year, month, totals = future.result()
+                results[(year, month)] = totals
+
+    written, skipped = [], []
+
+    for year, month in periods:
+        path = os.path.join(output_dir, period_filename(year, month))
+        if (year, month) in results and (force or not is_current(path, fingerprint)):
+            write_json_atomic(path, build_dashboard_payload(results[(year, month)], year, month, fingerprint))
+            written.append(path)
+        else:
+            skipped.append(path)
+
+    def yearly_totals(year):
+        totals = {}
+        for month in range(1, 13):
+            for district, count in results[(year, month)].items():
+                totals[district] = totals.get(district, 0) + count
+        return totals
+
+    if yearly:
+        for year in sorted(months_by_year):
+            if len(months_by_year[year]) != 12:
+                continue
+            path = os.path.join(output_dir, period_filename(year))
+            if all((year, month) in results for month in range(1, 13)) and \
+                    (force or not is_current(path, fingerprint)):
+                write_json_atomic(path, build_dashboard_payload(yearly_totals(year), year, None, fingerprint))
+                written.append(path)
+            else:
+                skipped.append(path)
+
+    if map_year is not None:
+        write_json_atomic(map_path, build_map_payload(yearly_totals(map_year), map_year, fingerprint))
+        written.append(map_path)
+    elif map_skipped:
+        skipped.append(map_path)
+
+    return {'written': written, 'skipped': skipped}
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Bulk-export dashboard prediction files")
+    parser.add_argument('--start', type=parse_period, required=True, help="First period (YYYY-MM or YYYY)")
+    parser.add_argument('--end', type=parse_period, help="Last period (YYYY-MM or YYYY), defaults to --start")
+    parser.add_argument('--model', default='student_registration_model.pkl', help="Trained model file")
+    parser.add_argument('--output-dir', default='.', help="Directory for the JSON files")
+    parser.add_argument('--yearly', action='store_true', help="Also write predictions_YYYY.json for full years")
+    parser.add_argument('--map-year', type=int, help="Year to write district_predictions_map_data.json for")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="Rewrite files even if they are current")
+    args = parser.parse_args(argv)
+
+    start = args.start
+    end = args.end or (start[0], start[1] or 12)
+    periods = expand_periods(start, end)
+    if not periods:
+        parser.error("--end must not be before --start")
+    low, high = PREDICTION_YEAR_RANGE
+    if args.map_year is not None and not low <= args.map_year <= high:
+        parser.error(f"--map-year must be between {low} and {high}")
+
+    print(f"🔮 Exporting {len(periods)} periods ({periods[0][0]}-{periods[0][1]:02d} "
+          f"to {periods[-1][0]}-{periods[-1][1]:02d})...")
+    started = time.perf_counter()
+
+    summary = export_predictions(
+        periods, model_path=args.model, output_dir=args.output_dir, yearly=args.yearly,
+        map_year=args.map_year, workers=args.workers, force=args.force
+    )
+
+    elapsed = time.perf_counter() - started
+    print(f"💾 Wrote {len(summary['written'])} files, skipped {len(summary['skipped'])} up-to-date files")
+    print(f"⏱️  Finished in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
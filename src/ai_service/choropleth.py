@@ -0,0 +1,144 @@
+"""
+Server-side choropleth payloads for the district map
+
+The district geometry is loaded once, simplified and cached. Predictions are
+joined onto it here and binned into colour classes, so the dashboard only
+has to draw the features it receives.
+"""
+
+import copy
+import json
+import os
+from functools import lru_cache
+
+# Shipped with the service; MAP_GEOMETRY_PATH points elsewhere
+DEFAULT_GEOMETRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sri-lanka-districts.json')
+
+# Douglas-Peucker tolerance and coordinate rounding, in degrees / decimal places
+SIMPLIFY_TOLERANCE = 0.005
+COORDINATE_PRECISION = 4
+
+
+def _perpendicular_distance(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / (dx * dx + dy * dy) ** 0.5
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of a list of [x, y] points"""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0.0, None
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _simplify_ring(ring, tolerance, precision):
+    simplified = simplify_line(ring, tolerance)
+    # A closed ring needs at least four positions; fall back to the original
+    if len(simplified) < 4:
+        simplified = ring
+    return [[round(x, precision), round(y, precision)] for x, y in simplified]
+
+
+def simplify_geometry(geometry, tolerance=SIMPLIFY_TOLERANCE, precision=COORDINATE_PRECISION):
+    """Simplify a Polygon or MultiPolygon geometry"""
+    if geometry['type'] == 'Polygon':
+        coordinates = [_simplify_ring(ring, tolerance, precision) for ring in geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        coordinates = [
+            [_simplify_ring(ring, tolerance, precision) for ring in polygon]
+            for polygon in geometry['coordinates']
+        ]
+    else:
+        return geometry
+    return {'type': geometry['type'], 'coordinates': coordinates}
+
+
+@lru_cache(maxsize=4)
+def load_district_geometry(path=None, tolerance=SIMPLIFY_TOLERANCE, precision=COORDINATE_PRECISION):
+    """District FeatureCollection, read once and simplified"""
+    path = path or os.getenv('MAP_GEOMETRY_PATH', DEFAULT_GEOMETRY_PATH)
+    try:
+        with open(path) as f:
+            collection = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"Cannot load district geometry from '{path}' (set MAP_GEOMETRY_PATH): {e}") from e
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'properties': {'name': feature['properties']['name']},
+                'geometry': simplify_geometry(feature['geometry'], tolerance, precision),
+            }
+            for feature in collection['features']
+        ],
+    }
+
+
+def bin_color(index, n_bins):
+    """Same blue ramp the map used to compute client-side, sampled at bin centres"""
+    normalized = (index + 0.5) / n_bins
+    return f"hsl(200, 80%, {round(100 - normalized * 50, 1)}%)"
+
+
+def build_choropleth(geometry, totals, n_bins=5):
+    """
+    Join district totals onto the geometry and assign equal-interval colour bins
+
+    ``totals`` maps district name to predicted registrations; districts missing
+    from it are drawn with a count of 0.
+    """
+    values = [totals.get(feature['properties']['name'], 0) for feature in geometry['features']]
+    low, high = min(values), max(values)
+    width = (high - low) / n_bins if high > low else 1
+    total = sum(totals.values())
+
+    def bin_of(value):
+        return min(int((value - low) / width), n_bins - 1) if high > low else 0
+
+    features = []
+    for feature, value in zip(geometry['features'], values):
+        index = bin_of(value)
+        joined = copy.copy(feature)
+        joined['properties'] = {
+            'name': feature['properties']['name'],
+            'predicted_registrations': value,
+            'percentage': round(value / total * 100, 1) if total > 0 else 0,
+            'bin': index,
+            'fill_color': bin_color(index, n_bins),
+        }
+        features.append(joined)
+
+    legend = [
+        {
+            'bin': i,
+            'min': round(low + i * width) if high > low else low,
+            'max': round(low + (i + 1) * width) if high > low else high,
+            'color': bin_color(i, n_bins),
+        }
+        for i in range(n_bins if high > low else 1)
+    ]
+
+    return {
+        'type': 'FeatureCollection',
+        'features': features,
+        'legend': legend,
+        'total_predicted': total,
+    }
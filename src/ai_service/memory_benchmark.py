@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+📏 MEMORY BENCHMARK
+Compares the compact dtype pipeline against the previous object/int64/float64 layout
+
+Each pipeline runs generate -> prepare -> fit -> predict in its own
+subprocess, and the peak resident set size (``getrusage`` high-water mark)
+is reported after every stage, side by side. The deep memory footprint of
+training data, feature matrix and predictions in both layouts, and the
+tracemalloc peak of each compact stage, are reported as well.
+
+Example:
+    python memory_benchmark.py --years 5 --records-per-month 2000
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from student_registration_prediction_system import StudentRegistrationPredictor
+
+
+def legacy_layout(df):
+    """The same frame with the dtypes the dict-based pipeline used to produce"""
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[column] = object
+        elif np.issubdtype(dtype, np.integer):
+            dtypes[column] = np.int64
+        elif np.issubdtype(dtype, np.floating):
+            dtypes[column] = np.float64
+    return df.astype(dtypes)
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def measure(func, *args, **kwargs):
+    """Run ``func`` and return its result with the tracemalloc peak in bytes"""
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def mb(n_bytes):
+    return n_bytes / 1024 / 1024
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_pipeline(layout, years, records_per_month, predict_year):
+    """
+    Generate, prepare, fit and predict with ``layout`` ('compact' or 'legacy')
+
+    Returns the peak RSS after each stage. Meant to run alone in a fresh
+    process, since the high-water mark never goes down. The legacy pipeline
+    converts each frame to the legacy dtypes as soon as it is built, so it
+    briefly holds both layouts; the removed dict-of-rows code held more.
+    """
+    peaks = {'import': peak_rss_bytes()}
+    predictor = StudentRegistrationPredictor()
+
+    df = predictor.generate_synthetic_data(years, records_per_month)
+    if layout == 'legacy':
+        df = legacy_layout(df)
+    peaks['generate'] = peak_rss_bytes()
+
+    X, y = predictor.prepare_features(df)
+    if layout == 'legacy':
+        X = legacy_layout(X)
+    del df
+    peaks['prepare'] = peak_rss_bytes()
+
+    predictor.model = RandomForestRegressor(n_estimators=20, max_depth=10, random_state=42, n_jobs=1)
+    predictor.model.fit(X, y)
+    del X, y
+    peaks['fit'] = peak_rss_bytes()
+
+    if layout == 'legacy':
+        feature_df = legacy_layout(predictor._build_prediction_frame(predict_year, list(range(1, 13))))
+        feature_df = predictor._prepare_prediction_features(feature_df)
+        feature_df['predicted_registrations'] = np.clip(
+            np.round(predictor.model.predict(feature_df[predictor.feature_columns])), 0, None
+        ).astype(np.int64)
+        feature_df.groupby(['month', 'district'])['predicted_registrations'].sum()
+    else:
+        predictor.predict_registrations_compact(predict_year)
+    peaks['predict'] = peak_rss_bytes()
+    return peaks
+
+
+def measure_rss(layout, args):
+    """Run one pipeline in a subprocess and return its per-stage peak RSS"""
+    command = [
+        sys.executable, __file__, '--pipeline', layout,
+        '--years', str(args.years), '--records-per-month', str(args.records_per_month),
+        '--predict-year', str(args.predict_year),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def report(label, compact, legacy):
+    ratio = legacy / compact if compact else float('nan')
+    print(f"{label:<28} {mb(compact):>10.2f} MB {mb(legacy):>10.2f} MB {ratio:>7.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory footprint of the compact dtype pipeline")
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--records-per-month', type=int, default=2000)
+    parser.add_argument('--predict-year', type=int, default=2026)
+    parser.add_argument('--pipeline', choices=['compact', 'legacy'], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.pipeline:
+        # Subprocess mode: report this pipeline's peaks as the last output line
+        peaks = run_pipeline(args.pipeline, args.years, args.records_per_month, args.predict_year)
+        print(json.dumps(peaks))
+        return 0
+
+    compact_rss = measure_rss('compact', args)
+    legacy_rss = measure_rss('legacy', args)
+
+    predictor = StudentRegistrationPredictor()
+
+    df, generate_peak = measure(predictor.generate_synthetic_data, args.years, args.records_per_month)
+    (X, y), prepare_peak = measure(predictor.prepare_features, df)
+
+    # A small forest is enough to exercise the prediction path
+    predictor.model = RandomForestRegressor(n_estimators=20, max_depth=10, random_state=42, n_jobs=-1)
+    predictor.model.fit(X, y)
+
+    (detail, summary), predict_peak = measure(predictor.predict_registrations_compact, args.predict_year)
+    pred_df, district_summary = predictor.predict_registrations(args.predict_year)
+
+    print("\n📏 MEMORY FOOTPRINT")
+    print("-" * 62)
+    print(f"{'Stage':<28} {'Compact':>13} {'Legacy':>13} {'Saving':>8}")
+    print("-" * 62)
+    report("Training data", frame_bytes(df), frame_bytes(legacy_layout(df)))
+    report("Feature matrix", frame_bytes(X), frame_bytes(legacy_layout(X)))
+    report("Predictions (detail)", detail.nbytes, frame_bytes(pred_df.astype({'year': np.int64, 'month': np.int64})))
+    report("Predictions (by district)", summary.nbytes,
+           frame_bytes(district_summary.astype({'year': np.int64, 'month': np.int64})))
+    print("-" * 62)
+
+    print("\n⏱️  TRACEMALLOC PEAK PER STAGE")
+    print(f"   generate_synthetic_data:       {mb(generate_peak):8.2f} MB")
+    print(f"   prepare_features:              {mb(prepare_peak):8.2f} MB")
+    print(f"   predict_registrations_compact: {mb(predict_peak):8.2f} MB")
+
+    print("\n🧠 PEAK RSS PER PIPELINE (one process each)")
+    print("-" * 62)
+    print(f"{'After stage':<28} {'Compact':>13} {'Legacy':>13} {'Saving':>8}")
+    print("-" * 62)
+    for stage in ['import', 'generate', 'prepare', 'fit', 'predict']:
+        report(stage, compact_rss[stage], legacy_rss[stage])
+    # Interpreter and library imports are the same for both; compare what the data adds
+    report("above import baseline",
+           compact_rss['predict'] - compact_rss['import'], legacy_rss['predict'] - legacy_rss['import'])
+    print("-" * 62)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
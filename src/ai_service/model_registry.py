@@ -0,0 +1,255 @@
+"""
+In-memory registry of versioned prediction models
+
+Artifacts are discovered as ``<models_dir>/<version>.pkl`` (plus the legacy
+``student_registration_model.pkl`` as version ``default``), loaded lazily and
+kept in a bounded LRU set. Requests may pin a version; unpinned requests go to
+the default version, or to canary versions for a configured share of traffic.
+Shadow versions are evaluated off the request path for a share of traffic and
+only their divergence from the served prediction is recorded.
+"""
+
+import glob
+import os
+import random
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+
+from student_registration_prediction_system import StudentRegistrationPredictor
+
+LEGACY_MODEL_PATH = 'student_registration_model.pkl'
+LEGACY_VERSION = 'default'
+
+
+def parse_traffic_split(value):
+    """Parse ``"v2=10,v3=5"`` into ``{'v2': 10.0, 'v3': 5.0}`` (percentages)"""
+    split = {}
+    for part in filter(None, (item.strip() for item in (value or '').split(','))):
+        version, _, pct = part.partition('=')
+        split[version.strip()] = float(pct)
+    if sum(split.values()) > 100:
+        raise ValueError("Canary traffic percentages add up to more than 100")
+    return split
+
+
+def estimate_model_bytes(model):
+    """Approximate in-memory size of a fitted forest from its tree arrays"""
+    total = 0
+    for estimator in getattr(model, 'estimators_', []):
+        tree = getattr(estimator, 'tree_', None)
+        if tree is not None:
+            state = tree.__getstate__()
+            total += state['nodes'].nbytes + state['values'].nbytes
+    return total
+
+
+class VersionStats:
+    """Request count and latency for one model version"""
+
+    __slots__ = ('requests', 'total_ms', 'max_ms', 'load_ms',
+                 'shadow_requests', 'shadow_total_ms', 'shadow_abs_delta')
+
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.load_ms = None
+        self.shadow_requests = 0
+        self.shadow_total_ms = 0.0
+        self.shadow_abs_delta = 0.0
+
+    def record(self, elapsed_ms):
+        self.requests += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def record_shadow(self, elapsed_ms, mean_abs_delta):
+        self.shadow_requests += 1
+        self.shadow_total_ms += elapsed_ms
+        self.shadow_abs_delta += mean_abs_delta
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'avg_latency_ms': round(self.total_ms / self.requests, 3) if self.requests else None,
+            'max_latency_ms': round(self.max_ms, 3) if self.requests else None,
+            'load_ms': round(self.load_ms, 3) if self.load_ms is not None else None,
+            'shadow_requests': self.shadow_requests,
+            'shadow_avg_latency_ms': (
+                round(self.shadow_total_ms / self.shadow_requests, 3) if self.shadow_requests else None
+            ),
+            # Mean absolute difference per district against the served version
+            'shadow_mean_abs_delta': (
+                round(self.shadow_abs_delta / self.shadow_requests, 3) if self.shadow_requests else None
+            ),
+        }
+
+
+class ModelRegistry:
+    """Lazily loads model versions and keeps at most ``max_loaded`` in memory"""
+
+    def __init__(self, models_dir='models', max_loaded=3, default_version=None, traffic_split=None,
+                 shadow_split=None):
+        self.models_dir = models_dir
+        self.max_loaded = max_loaded
+        self.artifacts = {}
+        self.traffic_split = dict(traffic_split or {})
+        self.shadow_split = dict(shadow_split or {})
+        self._loaded = OrderedDict()
+        self._stats = {}
+        self._lock = Lock()
+        self.discover()
+        self.default_version = default_version or self._initial_default()
+        self._check_versions()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            models_dir=os.getenv('MODEL_DIR', 'models'),
+            max_loaded=int(os.getenv('MODEL_CACHE_SIZE', '3')),
+            default_version=os.getenv('MODEL_DEFAULT_VERSION') or None,
+            traffic_split=parse_traffic_split(os.getenv('MODEL_CANARY_TRAFFIC', '')),
+            shadow_split=parse_traffic_split(os.getenv('MODEL_SHADOW_TRAFFIC', '')),
+        )
+
+    def _check_versions(self):
+        """Fail fast on configured versions that have no artifact"""
+        configured = {
+            'MODEL_DEFAULT_VERSION': [self.default_version] if self.default_version else [],
+            'MODEL_CANARY_TRAFFIC': list(self.traffic_split),
+            'MODEL_SHADOW_TRAFFIC': list(self.shadow_split),
+        }
+        for setting, versions in configured.items():
+            unknown = sorted(set(versions) - set(self.artifacts))
+            if unknown:
+                raise ValueError(
+                    f"{setting} refers to unknown model versions {unknown}; "
+                    f"available: {sorted(self.artifacts)}"
+                )
+
+    def discover(self):
+        """Rescan the models directory for artifacts"""
+        artifacts = {}
+        if os.path.exists(LEGACY_MODEL_PATH):
+            artifacts[LEGACY_VERSION] = LEGACY_MODEL_PATH
+        for path in sorted(glob.glob(os.path.join(self.models_dir, '*.pkl'))):
+            version = os.path.splitext(os.path.basename(path))[0]
+            artifacts[version] = path
+        with self._lock:
+            self.artifacts = artifacts
+        return sorted(artifacts)
+
+    def _initial_default(self):
+        if LEGACY_VERSION in self.artifacts:
+            return LEGACY_VERSION
+        if not self.artifacts:
+            return None
+        # Most recently written artifact
+        return max(self.artifacts, key=lambda version: os.path.getmtime(self.artifacts[version]))
+
+    def choose_version(self, requested=None):
+        """Pinned version if given, otherwise default or a canary by traffic share"""
+        if requested:
+            return requested
+        roll = random.random() * 100
+        for version, pct in self.traffic_split.items():
+            if roll < pct:
+                return version
+            roll -= pct
+        return self.default_version
+
+    def choose_shadows(self, served_version):
+        """Shadow versions to evaluate alongside a request served by ``served_version``"""
+        return [
+            version for version, pct in self.shadow_split.items()
+            if version != served_version and random.random() * 100 < pct
+        ]
+
+    def get(self, version=None):
+        """Return the loaded predictor for ``version``, loading it if needed"""
+        version = version or self.default_version
+        with self._lock:
+            predictor = self._loaded.get(version)
+            if predictor is not None:
+                self._loaded.move_to_end(version)
+                return predictor
+            path = self.artifacts.get(version)
+        if path is None:
+            raise KeyError(f"Unknown model version '{version}'")
+
+        started = time.perf_counter()
+        predictor = StudentRegistrationPredictor()
+        predictor.load_model(path)
+        predictor.model_version = version
+        load_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self._loaded[version] = predictor
+            self._loaded.move_to_end(version)
+            self._stats.setdefault(version, VersionStats()).load_ms = load_ms
+            self._evict()
+        return predictor
+
+    def _evict(self):
+        # Never evict the default version; it serves most traffic
+        while len(self._loaded) > self.max_loaded:
+            for candidate in self._loaded:
+                if candidate != self.default_version:
+                    del self._loaded[candidate]
+                    break
+            else:
+                break
+
+    def add(self, version, predictor):
+        """Register an already loaded predictor (e.g. a freshly trained model)"""
+        predictor.model_version = version
+        with self._lock:
+            self._loaded[version] = predictor
+            self._loaded.move_to_end(version)
+            self._stats.setdefault(version, VersionStats())
+            self._evict()
+
+    def set_default(self, version):
+        """Route unpinned traffic to ``version``"""
+        if version not in self.artifacts and version not in self._loaded:
+            raise KeyError(f"Unknown model version '{version}'")
+        self.default_version = version
+
+    @contextmanager
+    def track(self, version):
+        """Record the latency of a prediction served by ``version``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._stats.setdefault(version, VersionStats()).record(elapsed_ms)
+
+    def record_shadow(self, version, elapsed_ms, mean_abs_delta):
+        """Record one shadow evaluation of ``version``"""
+        with self._lock:
+            self._stats.setdefault(version, VersionStats()).record_shadow(elapsed_ms, mean_abs_delta)
+
+    def describe(self):
+        """Per-version status for the admin listing"""
+        with self._lock:
+            versions = sorted(set(self.artifacts) | set(self._loaded))
+            report = []
+            for version in versions:
+                predictor = self._loaded.get(version)
+                stats = self._stats.get(version, VersionStats())
+                report.append({
+                    'version': version,
+                    'path': self.artifacts.get(version),
+                    'loaded': predictor is not None,
+                    'default': version == self.default_version,
+                    'traffic_pct': self.traffic_split.get(version),
+                    'shadow_pct': self.shadow_split.get(version),
+                    'fingerprint': predictor.model_fingerprint if predictor is not None else None,
+                    'model_bytes': estimate_model_bytes(predictor.model) if predictor is not None else None,
+                    **stats.as_dict(),
+                })
+            return report
@@ -0,0 +1,178 @@
+"""
+Opt-in, in-memory profiling of prediction requests
+
+Disabled unless ``PREDICTION_PROFILING=1``. When enabled, a request is profiled
+if it carries the ``X-Profile-Request: 1`` header or falls into the
+``PREDICTION_PROFILE_SAMPLE_PCT`` percentage of sampled requests. A profiled
+request records per-stage timings (see ``profile_stage``) and a cProfile call
+stack; the last ``PREDICTION_PROFILE_BUFFER`` profiles are kept in a ring
+buffer. Nothing is written to disk.
+
+Profiles expose request labels and call stacks, so reading them requires the
+``PREDICTION_PROFILE_ADMIN_TOKEN`` value in the ``X-Admin-Token`` header; with
+no token configured they cannot be read at all.
+"""
+
+import cProfile
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from threading import Lock
+
+PROFILE_HEADER = 'x-profile-request'
+ADMIN_TOKEN_HEADER = 'x-admin-token'
+
+# Profile of the request currently executing, if any
+_current_profile = ContextVar('prediction_profile', default=None)
+
+
+@contextmanager
+def profile_stage(name):
+    """Time a pipeline stage when the current request is being profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        profile.stages[name] = profile.stages.get(name, 0.0) + elapsed_ms
+
+
+class RequestProfile:
+    """Timings and call-stack statistics captured for one request"""
+
+    def __init__(self, profile_id, label, trigger):
+        self.id = profile_id
+        self.label = label
+        self.trigger = trigger
+        self.created_at = datetime.now().isoformat()
+        self.stages = {}
+        self.total_ms = None
+        self.stats = None
+
+    def top_functions(self, limit=25):
+        """Human-readable cumulative-time listing of the call stack profile"""
+        if self.stats is None:
+            return ''
+        stream = io.StringIO()
+        stats = pstats.Stats(_StatsSource(self.stats), stream=stream)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def dump(self):
+        """Stats in the ``pstats``/``snakeviz`` file format"""
+        return marshal.dumps(self.stats) if self.stats is not None else b''
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'label': self.label,
+            'trigger': self.trigger,
+            'created_at': self.created_at,
+            'total_ms': round(self.total_ms, 3) if self.total_ms is not None else None,
+            'stages_ms': {name: round(ms, 3) for name, ms in self.stages.items()},
+        }
+
+
+class _StatsSource:
+    """Minimal profiler stand-in so ``pstats.Stats`` can load captured stats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class PredictionProfiler:
+    """Decides which requests to profile and keeps the most recent profiles"""
+
+    def __init__(self, enabled=False, sample_pct=0.0, buffer_size=20, admin_token=None):
+        self.enabled = enabled
+        self.sample_pct = sample_pct
+        self.admin_token = admin_token or None
+        self._profiles = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv('PREDICTION_PROFILING', '0') == '1',
+            sample_pct=float(os.getenv('PREDICTION_PROFILE_SAMPLE_PCT', '0')),
+            buffer_size=int(os.getenv('PREDICTION_PROFILE_BUFFER', '20')),
+            admin_token=os.getenv('PREDICTION_PROFILE_ADMIN_TOKEN'),
+        )
+
+    def authorized(self, headers):
+        """Whether ``headers`` carry the admin token needed to read profiles"""
+        supplied = headers.get(ADMIN_TOKEN_HEADER)
+        if self.admin_token is None or supplied is None:
+            return False
+        return hmac.compare_digest(supplied.encode('utf-8'), self.admin_token.encode('utf-8'))
+
+    def _trigger(self, headers):
+        if not self.enabled:
+            return None
+        if headers.get(PROFILE_HEADER) == '1':
+            return 'header'
+        if self.sample_pct > 0 and random.random() * 100 < self.sample_pct:
+            return 'sampled'
+        return None
+
+    def maybe_profile(self, headers, label):
+        """
+        Context manager that profiles the block if this request is selected
+
+        Yields the ``RequestProfile`` being recorded, or ``None``.
+        """
+        trigger = self._trigger(headers)
+        if trigger is None:
+            return nullcontext()
+        return self._profile(label, trigger)
+
+    @contextmanager
+    def _profile(self, label, trigger):
+        profile = RequestProfile(next(self._ids), label, trigger)
+        token = _current_profile.set(profile)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this thread; keep stage timings only
+            profiler = None
+        started = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.total_ms = (time.perf_counter() - started) * 1000
+            if profiler is not None:
+                profiler.disable()
+                profiler.create_stats()
+                profile.stats = profiler.stats
+            _current_profile.reset(token)
+            with self._lock:
+                self._profiles.append(profile)
+
+    def list(self):
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
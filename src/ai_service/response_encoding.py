@@ -0,0 +1,156 @@
+"""
+Pre-encoded, conditional-GET-aware responses for the prediction API
+
+Payloads are serialized once per (model fingerprint, request parameters) and
+kept as raw and gzip-compressed bytes, so repeat dashboard views skip both the
+model and JSON encoding. ETags are derived from the same key plus the content
+encoding, so they survive evictions, restarts and multiple workers, and clients
+holding a matching ETag get a 304 without the payload being recomputed.
+"""
+
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import Response
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+
+def make_cache_key(fingerprint, *params):
+    """Cache key derived from the model fingerprint and the request parameters"""
+    key = json.dumps([fingerprint, *params], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def accepts_gzip(accept_encoding):
+    """True if an Accept-Encoding header allows gzip (honouring ``q=0``)"""
+    qualities = {}
+    for part in filter(None, (item.strip() for item in (accept_encoding or '').split(','))):
+        coding, *params = [piece.strip() for piece in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def response_etags(key):
+    """
+    Weak ETags for the identity and gzip representations of ``key``
+
+    Weak because bodies carry a generation timestamp: recomputed payloads are
+    equivalent (predictions are deterministic) but not byte-identical.
+    """
+    return f'W/"{key[:32]}"', f'W/"{key[:32]}-gzip"'
+
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against ``etag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+
+    def opaque(tag):
+        return tag[2:] if tag.startswith('W/') else tag
+
+    candidates = [opaque(value.strip()) for value in if_none_match.split(',')]
+    return '*' in candidates or opaque(etag) in candidates
+
+
+class EncodedPayload:
+    """A JSON body encoded once, with a lazily built gzip variant"""
+
+    __slots__ = ('body', '_gzipped')
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self._gzipped = None
+
+    @property
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+class EncodedResponseCache:
+    """Bounded LRU cache of encoded payloads keyed by request"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, payload):
+        entry = EncodedPayload(payload)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def encoded_response(cache, key, request_headers, compute_payload, extra_headers=None, refresh=False):
+    """
+    Answer a request from ``cache``, computing the payload only on a miss
+
+    Returns a 304 when the client already holds the ETag of the representation
+    it would receive, otherwise the cached bytes, gzip-compressed when the
+    client accepts it and the body is large. ``refresh`` recomputes the payload
+    even when it is cached, without replacing the cached entry.
+    """
+    identity_etag, gzip_etag = response_etags(key)
+    gzip_ok = accepts_gzip(request_headers.get('accept-encoding'))
+    if_none_match = request_headers.get('if-none-match')
+    headers = {
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+        **(extra_headers or {}),
+    }
+
+    # Revalidate without a payload when the held tag settles the representation:
+    # only large bodies have a gzip tag, and without gzip the identity tag is final
+    held = gzip_etag if gzip_ok else identity_etag
+    if not refresh and etag_matches(if_none_match, held):
+        return Response(status_code=304, headers={'ETag': held, **headers})
+
+    if refresh:
+        entry = EncodedPayload(compute_payload())
+    else:
+        entry = cache.get(key)
+        if entry is None:
+            entry = cache.put(key, compute_payload())
+
+    use_gzip = gzip_ok and len(entry.body) >= GZIP_MIN_BYTES
+    headers['ETag'] = gzip_etag if use_gzip else identity_etag
+    if etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=304, headers=headers)
+
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(content=entry.gzipped, media_type='application/json', headers=headers)
+
+    return Response(content=entry.body, media_type='application/json', headers=headers)
@@ -3,17 +3,209 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
+from sklearn.model_selection import train_test_split, GridSearchCV, ParameterGrid, check_cv, cross_val_score
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.inspection import permutation_importance
+from joblib import effective_n_jobs
 from sklearn.preprocessing import LabelEncoder, StandardScaler
+import os
 import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
 import warnings
 from datetime import datetime, timedelta
-import random
 import json
 
+try:
+    from .profiling import profile_stage
+except ImportError:
+    # Running as a script from this directory rather than as the ai_service package
+    from profiling import profile_stage
+
 warnings.filterwarnings('ignore')
 
+# District categories in code order, and the uniform ranges drawn for each
+DISTRICT_CATEGORY_ORDER = ['urban', 'semi_urban', 'rural']
+URBAN_INDEX_RANGES = {'urban': (0.7, 1.0), 'semi_urban': (0.4, 0.7), 'rural': (0.1, 0.4)}
+COMPETITION_LEVEL_RANGES = {'urban': (0.7, 1.0), 'semi_urban': (0.4, 0.7), 'rural': (0.1, 0.4)}
+
+# Years accepted for predictions (stored as int16 in the compact records)
+PREDICTION_YEAR_RANGE = (2000, 2100)
+
+# Compact prediction records; district/program are codes into the predictor's lists
+PREDICTION_DTYPE = np.dtype([
+    ('year', np.int16), ('month', np.int8), ('district', np.int16),
+    ('program', np.int16), ('predicted_registrations', np.int32)
+])
+DISTRICT_SUMMARY_DTYPE = np.dtype([
+    ('year', np.int16), ('month', np.int8), ('district', np.int16),
+    ('predicted_registrations', np.int32)
+])
+
+# Features a what-if scenario may override
+SCENARIO_FLAG_FEATURES = [
+    'covid_impact', 'economic_crisis', 'is_peak_season', 'is_holiday_period',
+    'al_results_month', 'university_intake'
+]
+SCENARIO_DISTRICT_FEATURES = [
+    'economic_index', 'accessibility_score', 'population_density', 'urban_index', 'competition_level'
+]
+
+# Segmentations accepted by ``train_model(segment_by=...)`` and the encoded column each routes on
+SEGMENT_ROUTE_COLUMNS = {'district_category': 'district_encoded', 'program': 'program_encoded'}
+
+
+def available_cores():
+    """CPUs this process may run on (respects the affinity mask where supported)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ProgressGridSearchCV(GridSearchCV):
+    """
+    GridSearchCV that evaluates candidates in batches and reports progress
+    
+    Set ``progress_callback`` to a ``callable(fits_done, fits_total)``; it is
+    invoked after each batch. Results are identical to ``GridSearchCV``.
+    """
+    
+    progress_callback = None
+    
+    def _run_search(self, evaluate_candidates):
+        candidates = list(ParameterGrid(self.param_grid))
+        if self.progress_callback is None:
+            evaluate_candidates(candidates)
+            return
+        
+        n_splits = check_cv(self.cv).get_n_splits()
+        total_fits = len(candidates) * n_splits
+        # Batches big enough to keep every core busy between progress reports
+        batch_size = max(1, 2 * effective_n_jobs(self.n_jobs) // n_splits)
+        
+        self.progress_callback(0, total_fits)
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            evaluate_candidates(batch)
+            self.progress_callback((start + len(batch)) * n_splits, total_fits)
+
+
+def _fit_segment(name, X, y, param_grid, n_jobs, cv=5):
+    """Process pool task: grid-search and refit the forest for one segment"""
+    search = GridSearchCV(
+        RandomForestRegressor(random_state=42, n_jobs=1), param_grid, cv=cv,
+        scoring='neg_mean_absolute_error', n_jobs=n_jobs, refit=False
+    )
+    search.fit(X, y)
+    
+    model = RandomForestRegressor(
+        random_state=42, n_jobs=n_jobs, oob_score=search.best_params_.get('bootstrap', True),
+        **search.best_params_
+    )
+    model.fit(X, y)
+    
+    best = search.best_index_
+    return {
+        'name': name,
+        'model': model,
+        'best_params': search.best_params_,
+        'cv_mae_mean': -search.cv_results_['mean_test_score'][best],
+        'cv_mae_std': search.cv_results_['std_test_score'][best],
+        'n_fits': len(search.cv_results_['params']) * search.n_splits_,
+    }
+
+
+class SegmentedForest:
+    """
+    Per-segment forests served through a single ``predict``
+    
+    Each row is routed by its code in ``route_column`` through
+    ``segment_of_code`` (code -> segment index). Codes without a segment, such
+    as -1 for categories unseen in training, go to the ``fallback`` segment.
+    Exposes the parts of the ``RandomForestRegressor`` interface the rest of
+    the system relies on.
+    """
+    
+    def __init__(self, segment_names, models, route_column, segment_of_code, feature_names,
+                 sample_counts, fallback=0, best_params=None):
+        self.segment_names = list(segment_names)
+        self.models = list(models)
+        self.route_column = route_column
+        self.segment_of_code = np.asarray(segment_of_code, dtype=np.int16)
+        self.feature_names = list(feature_names)
+        self.sample_counts = np.asarray(sample_counts, dtype=np.int64)
+        self.fallback = fallback
+        self.best_params_ = dict(best_params or {})
+        # Training-time diagnostics, not persisted
+        self.oob_prediction_ = None
+        self.cv_mae_mean_ = None
+        self.cv_mae_std_ = None
+    
+    def route(self, X):
+        """Segment index for every row of ``X``"""
+        if isinstance(X, pd.DataFrame):
+            codes = X[self.route_column].to_numpy()
+        else:
+            codes = np.asarray(X)[:, self.feature_names.index(self.route_column)]
+        codes = codes.astype(np.int64)
+        
+        segments = np.full(len(codes), self.fallback, dtype=np.int16)
+        known = (codes >= 0) & (codes < len(self.segment_of_code))
+        segments[known] = self.segment_of_code[codes[known]]
+        segments[segments < 0] = self.fallback
+        return segments
+    
+    def predict(self, X):
+        """Predict each row with its segment's forest and merge back into row order"""
+        segments = self.route(X)
+        predictions = np.zeros(len(segments))
+        for index, model in enumerate(self.models):
+            rows = np.flatnonzero(segments == index)
+            if len(rows):
+                part = X.iloc[rows] if isinstance(X, pd.DataFrame) else np.asarray(X)[rows]
+                predictions[rows] = model.predict(part)
+        return predictions
+    
+    @property
+    def feature_importances_(self):
+        """Segment importances weighted by each segment's training rows"""
+        return np.average(
+            [model.feature_importances_ for model in self.models], axis=0, weights=self.sample_counts
+        )
+    
+    @property
+    def estimators_(self):
+        return [estimator for model in self.models for estimator in model.estimators_]
+    
+    @property
+    def n_jobs(self):
+        return self.models[0].n_jobs if self.models else None
+    
+    @n_jobs.setter
+    def n_jobs(self, value):
+        for model in self.models:
+            model.n_jobs = value
+    
+    def to_state(self):
+        """Plain forests and arrays for the model artifact"""
+        return {
+            'segment_names': self.segment_names,
+            'models': self.models,
+            'route_column': self.route_column,
+            'segment_of_code': self.segment_of_code,
+            'feature_names': self.feature_names,
+            'sample_counts': self.sample_counts,
+            'fallback': self.fallback,
+            'best_params': self.best_params_,
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        return cls(**state)
+
+
 class StudentRegistrationPredictor:
     """
     Professional ML System for Predicting Student Registrations by District in Sri Lanka
@@ -48,6 +240,9 @@ class StudentRegistrationPredictor:
         ]
         
         self.model = None
+        self.model_fingerprint = None
+        self.model_version = None
+        self.metrics = None
         self.feature_columns = None
         self.label_encoders = {}
         self.scaler = StandardScaler()
@@ -55,60 +250,33 @@ class StudentRegistrationPredictor:
     def generate_synthetic_data(self, years=5, records_per_month=50):
         """
         Generate realistic synthetic data for training the ML model
+        
+        Columns are built directly as compact arrays: districts, programs and
+        district/month pairs as categoricals, flags as ``int8`` and continuous
+        features as ``float32``.
         """
         print("🔄 Generating synthetic training data...")
         
-        data = []
-        base_date = datetime(2020, 1, 1)
-        
-        for year in range(2020, 2020 + years):
-            for month in range(1, 13):
-                for _ in range(records_per_month):
-                    # Select random district with weighted probability
-                    district = self._select_weighted_district()
-                    
-                    # Generate realistic registration patterns
-                    registration_data = {
-                        'year': year,
-                        'month': month,
-                        'district': district,
-                        'program': random.choice(self.programs),
-                        'registration_count': self._generate_registration_count(district, month, year),
-                        
-                        # Demographic features
-                        'population_density': self._get_population_density(district),
-                        'urban_index': self._get_urban_index(district),
-                        'economic_index': self._get_economic_index(district),
-                        
-                        # Seasonal features
-                        'is_peak_season': 1 if month in [1, 2, 7, 8] else 0,  # Jan-Feb, Jul-Aug
-                        'is_holiday_period': 1 if month in [4, 12] else 0,     # April, December
-                        'quarter': (month - 1) // 3 + 1,
-                        
-                        # Educational features
-                        'al_results_month': 1 if month in [1, 8] else 0,      # A/L results periods
-                        'university_intake': 1 if month in [2, 9] else 0,      # University intake months
-                        
-                        # External factors
-                        'covid_impact': 1 if year in [2020, 2021] else 0,
-                        'economic_crisis': 1 if year in [2022, 2023] else 0,
-                        
-                        # Historical trend
-                        'year_normalized': (year - 2020) / 5,  # Normalize year
-                        
-                        # Competition factors
-                        'competition_level': self._get_competition_level(district),
-                        'accessibility_score': self._get_accessibility_score(district)
-                    }
-                    
-                    data.append(registration_data)
-        
-        df = pd.DataFrame(data)
+        n_records = years * 12 * records_per_month
+        year = np.repeat(np.arange(2020, 2020 + years, dtype=np.int16), 12 * records_per_month)
+        month = np.tile(np.repeat(np.arange(1, 13, dtype=np.int8), records_per_month), years)
+        
+        # Select random districts with weighted probability, programs uniformly
+        district_codes = self._sample_districts(n_records)
+        program_codes = np.random.randint(len(self.programs), size=n_records)
+        
+        df = self._build_feature_frame(
+            year, month, district_codes, program_codes,
+            # External factors
+            covid_impact=np.isin(year, [2020, 2021]).astype(np.int8),
+            economic_crisis=np.isin(year, [2022, 2023]).astype(np.int8)
+        )
+        
+        # Generate realistic registration patterns
+        df.insert(4, 'registration_count', self._generate_registration_counts(district_codes, month, year))
         
         # Add interaction features
-        df['district_season_interaction'] = df['district'].astype(str) + '_' + df['month'].astype(str)
-        df['urban_population_interaction'] = df['urban_index'] * df['population_density']
-        df['economic_seasonal_interaction'] = df['economic_index'] * df['is_peak_season']
+        self._add_interaction_features(df)
         
         print(f"✅ Generated {len(df)} synthetic records")
         print(f"📊 Data shape: {df.shape}")
@@ -117,48 +285,146 @@ class StudentRegistrationPredictor:
         
         return df
     
-    def _select_weighted_district(self):
-        """Select district with realistic probability weights"""
+    def _build_feature_frame(self, year, month, district_codes, program_codes, covid_impact, economic_crisis,
+                             noise=True):
+        """
+        Raw feature columns for parallel arrays of periods, district codes and program codes
+        
+        With ``noise=False`` the per-record variance is left out: district
+        features take the centre of their ranges, so the same rows always
+        produce the same features (and predictions).
+        """
+        n_rows = len(district_codes)
+        profile = self._district_profile()
+        category = profile['category'][district_codes]
+        if noise:
+            urban_index = self._uniform_by_category(category, URBAN_INDEX_RANGES)
+            competition_level = self._uniform_by_category(category, COMPETITION_LEVEL_RANGES)
+            economic_index = (
+                profile['economic_index'][district_codes]
+                + np.random.uniform(-0.05, 0.05, n_rows).astype(np.float32)  # Add some variance
+            )
+        else:
+            urban_index = self._midpoint_by_category(category, URBAN_INDEX_RANGES)
+            competition_level = self._midpoint_by_category(category, COMPETITION_LEVEL_RANGES)
+            economic_index = profile['economic_index'][district_codes]
+        
+        # District/month pairs, coded as district * 12 + (month - 1)
+        season_categories = [f"{district}_{m}" for district in self.districts for m in range(1, 13)]
+        season_codes = district_codes * 12 + (month.astype(np.int16) - 1)
+        
+        return pd.DataFrame({
+            'year': np.broadcast_to(np.asarray(year, dtype=np.int16), n_rows),
+            'month': month,
+            'district': pd.Categorical.from_codes(district_codes, categories=self.districts),
+            'program': pd.Categorical.from_codes(program_codes, categories=self.programs),
+            
+            # Demographic features
+            'population_density': profile['population_density'][district_codes],
+            'urban_index': urban_index,
+            'economic_index': economic_index,
+            
+            # Seasonal features
+            'is_peak_season': np.isin(month, [1, 2, 7, 8]).astype(np.int8),  # Jan-Feb, Jul-Aug
+            'is_holiday_period': np.isin(month, [4, 12]).astype(np.int8),    # April, December
+            'quarter': ((month - 1) // 3 + 1).astype(np.int8),
+            
+            # Educational features
+            'al_results_month': np.isin(month, [1, 8]).astype(np.int8),      # A/L results periods
+            'university_intake': np.isin(month, [2, 9]).astype(np.int8),     # University intake months
+            
+            # External factors
+            'covid_impact': np.broadcast_to(np.asarray(covid_impact, dtype=np.int8), n_rows),
+            'economic_crisis': np.broadcast_to(np.asarray(economic_crisis, dtype=np.int8), n_rows),
+            
+            # Historical trend
+            'year_normalized': np.broadcast_to((np.asarray(year, dtype=np.float32) - 2020) / 5, n_rows),
+            
+            # Competition factors
+            'competition_level': competition_level,
+            'accessibility_score': profile['accessibility_score'][district_codes],
+            
+            'district_season_interaction': pd.Categorical.from_codes(season_codes, categories=season_categories)
+        })
+    
+    def _add_interaction_features(self, df):
+        """Add numeric interaction features in place"""
+        df['urban_population_interaction'] = df['urban_index'] * df['population_density']
+        df['economic_seasonal_interaction'] = df['economic_index'] * df['is_peak_season']
+        return df
+    
+    def _district_profile(self):
+        """Per-district lookup arrays, indexed by position in ``self.districts``"""
+        category_codes = {name: code for code, name in enumerate(DISTRICT_CATEGORY_ORDER)}
+        category = np.full(len(self.districts), category_codes['rural'], dtype=np.int8)
+        for name, members in self.district_categories.items():
+            for district in members:
+                if district in self.districts:
+                    category[self.districts.index(district)] = category_codes[name]
+        
+        return {
+            'category': category,
+            'population_density': np.array(
+                [self._get_population_density(d) for d in self.districts], dtype=np.float32),
+            'economic_index': np.array(
+                [self._get_economic_index(d) for d in self.districts], dtype=np.float32),
+            'accessibility_score': np.array(
+                [self._get_accessibility_score(d) for d in self.districts], dtype=np.float32),
+        }
+    
+    def _sample_districts(self, n_records):
+        """Select district codes with realistic probability weights by category"""
         urban_weight = 0.5
         semi_urban_weight = 0.3
         rural_weight = 0.2
         
-        category = np.random.choice(['urban', 'semi_urban', 'rural'], 
-                                  p=[urban_weight, semi_urban_weight, rural_weight])
-        return random.choice(self.district_categories[category])
+        categories = np.random.choice(
+            len(DISTRICT_CATEGORY_ORDER), size=n_records,
+            p=[urban_weight, semi_urban_weight, rural_weight]
+        )
+        district_codes = np.empty(n_records, dtype=np.int16)
+        for code, name in enumerate(DISTRICT_CATEGORY_ORDER):
+            members = np.array([self.districts.index(d) for d in self.district_categories[name]], dtype=np.int16)
+            mask = categories == code
+            district_codes[mask] = members[np.random.randint(len(members), size=mask.sum())]
+        return district_codes
     
-    def _generate_registration_count(self, district, month, year):
+    def _generate_registration_counts(self, district_codes, month, year):
         """Generate realistic registration counts based on district and seasonality"""
-        # Base registration by district type
-        if district in self.district_categories['urban']:
-            base = np.random.poisson(15)  # Higher registrations in urban areas
-        elif district in self.district_categories['semi_urban']:
-            base = np.random.poisson(8)   # Medium registrations
-        else:
-            base = np.random.poisson(4)   # Lower registrations in rural areas
+        # Base registration by district type: higher in urban, lower in rural areas
+        category = self._district_profile()['category'][district_codes]
+        base = np.random.poisson(np.array([15, 8, 4])[category])
         
         # Seasonal multipliers
-        seasonal_multiplier = 1.0
-        if month in [1, 2]:      # Post A/L results
-            seasonal_multiplier = 1.8
-        elif month in [7, 8]:    # Mid-year intake
-            seasonal_multiplier = 1.5
-        elif month in [4, 12]:   # Holiday periods
-            seasonal_multiplier = 0.6
+        seasonal_multiplier = np.select(
+            [np.isin(month, [1, 2]),      # Post A/L results
+             np.isin(month, [7, 8]),      # Mid-year intake
+             np.isin(month, [4, 12])],    # Holiday periods
+            [1.8, 1.5, 0.6], default=1.0
+        )
         
         # Year-based trends (slight growth over time)
         year_multiplier = 1 + (year - 2020) * 0.05
         
         # COVID impact
-        if year in [2020, 2021]:
-            year_multiplier *= 0.7
+        year_multiplier = np.where(np.isin(year, [2020, 2021]), year_multiplier * 0.7, year_multiplier)
         
         # Economic crisis impact
-        if year in [2022, 2023]:
-            year_multiplier *= 0.8
+        year_multiplier = np.where(np.isin(year, [2022, 2023]), year_multiplier * 0.8, year_multiplier)
         
-        final_count = max(0, int(base * seasonal_multiplier * year_multiplier))
-        return final_count
+        final_count = np.maximum(0, np.floor(base * seasonal_multiplier * year_multiplier))
+        return final_count.astype(np.int16)
+    
+    def _uniform_by_category(self, category, ranges):
+        """Draw ``float32`` values uniformly from each row's category range"""
+        low = np.array([ranges[name][0] for name in DISTRICT_CATEGORY_ORDER])[category]
+        high = np.array([ranges[name][1] for name in DISTRICT_CATEGORY_ORDER])[category]
+        return np.random.uniform(low, high).astype(np.float32)
+    
+    def _midpoint_by_category(self, category, ranges):
+        """Centre of each row's category range, as ``float32``"""
+        midpoints = np.array([sum(ranges[name]) / 2 for name in DISTRICT_CATEGORY_ORDER], dtype=np.float32)
+        return midpoints[category]
     
     def _get_population_density(self, district):
         """Get normalized population density score"""
@@ -173,33 +439,14 @@ class StudentRegistrationPredictor:
         }
         return density_map.get(district, 0.5)
     
-    def _get_urban_index(self, district):
-        """Get urban development index"""
-        if district in self.district_categories['urban']:
-            return np.random.uniform(0.7, 1.0)
-        elif district in self.district_categories['semi_urban']:
-            return np.random.uniform(0.4, 0.7)
-        else:
-            return np.random.uniform(0.1, 0.4)
-    
     def _get_economic_index(self, district):
-        """Get economic development index"""
+        """Get economic development index (before per-record variance)"""
         economic_map = {
             'Colombo': 0.90, 'Gampaha': 0.80, 'Kalutara': 0.70, 'Kandy': 0.75,
             'Galle': 0.70, 'Jaffna': 0.60, 'Kurunegala': 0.55, 'Batticaloa': 0.45,
             'Matara': 0.60, 'Anuradhapura': 0.50, 'Badulla': 0.50, 'Ratnapura': 0.55
         }
-        base_value = economic_map.get(district, 0.45)
-        return base_value + np.random.uniform(-0.05, 0.05)  # Add some variance
-    
-    def _get_competition_level(self, district):
-        """Get competition level from other institutions"""
-        if district in self.district_categories['urban']:
-            return np.random.uniform(0.7, 1.0)  # High competition
-        elif district in self.district_categories['semi_urban']:
-            return np.random.uniform(0.4, 0.7)  # Medium competition
-        else:
-            return np.random.uniform(0.1, 0.4)  # Low competition
+        return economic_map.get(district, 0.45)
     
     def _get_accessibility_score(self, district):
         """Get accessibility score (transport, infrastructure)"""
@@ -214,22 +461,15 @@ class StudentRegistrationPredictor:
         """Prepare features for machine learning"""
         print("🔧 Preparing features for ML model...")
         
-        # Create a copy to avoid modifying original data
-        df_processed = df.copy()
-        
-        # Encode categorical variables
+        # Encode categorical variables (new columns only; the input frame is not copied)
         categorical_columns = ['district', 'program', 'district_season_interaction']
         
+        encoded = {}
         for col in categorical_columns:
             if col not in self.label_encoders:
-                self.label_encoders[col] = LabelEncoder()
-                df_processed[col + '_encoded'] = self.label_encoders[col].fit_transform(df_processed[col])
-            else:
-                # Handle new categories in test data
-                df_processed[col + '_encoded'] = df_processed[col].apply(
-                    lambda x: self.label_encoders[col].transform([x])[0] 
-                    if x in self.label_encoders[col].classes_ else -1
-                )
+                self.label_encoders[col] = LabelEncoder().fit(self._observed_values(df[col]))
+            # Categories unseen by an existing encoder map to -1
+            encoded[col + '_encoded'] = self._encode_column(col, df[col])
         
         # Select feature columns
         feature_columns = [
@@ -244,16 +484,40 @@ class StudentRegistrationPredictor:
         self.feature_columns = feature_columns
         
         # Prepare feature matrix
-        X = df_processed[feature_columns]
-        y = df_processed['registration_count']
+        X = pd.DataFrame(
+            {name: encoded[name] if name in encoded else df[name].to_numpy() for name in feature_columns},
+            index=df.index
+        )
+        y = df['registration_count']
         
         print(f"✅ Features prepared: {len(feature_columns)} features")
         print(f"📊 Feature matrix shape: {X.shape}")
         
         return X, y
     
-    def train_model(self, X, y):
-        """Train Random Forest model with hyperparameter optimization"""
+    def _observed_values(self, values):
+        """Distinct values present in a column (categories actually used, for categoricals)"""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return values.cat.remove_unused_categories().cat.categories.to_numpy()
+        return values.unique()
+    
+    def train_model(self, X, y, param_grid=None, progress_callback=None, segment_by=None, max_workers=None):
+        """
+        Train Random Forest model with hyperparameter optimization
+        
+        ``progress_callback(fits_done, fits_total)`` is called as batches of
+        grid-search candidates finish. The evaluation results are kept in
+        ``self.metrics``.
+        
+        With ``segment_by`` ('district_category' or 'program') a separate forest
+        is searched and fitted per segment, concurrently in up to
+        ``max_workers`` processes (see ``_train_segments``).
+        """
+        if segment_by is not None and segment_by not in SEGMENT_ROUTE_COLUMNS:
+            raise ValueError(
+                f"Unknown segment_by '{segment_by}', expected one of {sorted(SEGMENT_ROUTE_COLUMNS)}"
+            )
+        
         print("🚀 Training Random Forest model...")
         
         # Split data
@@ -262,70 +526,203 @@ class StudentRegistrationPredictor:
         )
         
         # Hyperparameter tuning
-        param_grid = {
-            'n_estimators': [100, 200, 300],
-            'max_depth': [10, 15, 20, None],
-            'min_samples_split': [2, 5, 10],
-            'min_samples_leaf': [1, 2, 4],
-            'max_features': ['sqrt', 'log2', None]
-        }
+        if param_grid is None:
+            param_grid = {
+                'n_estimators': [100, 200, 300],
+                'max_depth': [10, 15, 20, None],
+                'min_samples_split': [2, 5, 10],
+                'min_samples_leaf': [1, 2, 4],
+                'max_features': ['sqrt', 'log2', None]
+            }
+        
+        if segment_by is not None:
+            self.model = self._train_segments(
+                X_train, y_train, param_grid, segment_by,
+                progress_callback=progress_callback, max_workers=max_workers
+            )
+            self.metrics = self.evaluate_model(X_test, y_test, X_train, y_train, oob=True)
+            return X_train, X_test, y_train, y_test
         
         # Initial model for quick tuning
         rf_base = RandomForestRegressor(random_state=42, n_jobs=-1)
         
         print("🔍 Performing hyperparameter optimization...")
-        grid_search = GridSearchCV(
+        grid_search = ProgressGridSearchCV(
             rf_base, param_grid, cv=5, scoring='neg_mean_absolute_error',
-            n_jobs=-1, verbose=1
+            n_jobs=-1, verbose=1, refit=False
         )
+        grid_search.progress_callback = progress_callback
         
         grid_search.fit(X_train, y_train)
         
-        # Best model
-        self.model = grid_search.best_estimator_
+        # Refit the best configuration once, collecting out-of-bag predictions for evaluation
+        # (only bootstrapped forests leave rows out of the bag)
+        self.model = RandomForestRegressor(
+            random_state=42, n_jobs=-1, oob_score=grid_search.best_params_.get('bootstrap', True),
+            **grid_search.best_params_
+        )
+        self.model.fit(X_train, y_train)
         
         print(f"✅ Best parameters: {grid_search.best_params_}")
         
-        # Evaluate model
-        self.evaluate_model(X_test, y_test, X_train, y_train)
+        # Evaluate model, reusing the search's cross-validation results
+        self.metrics = self.evaluate_model(X_test, y_test, X_train, y_train, search=grid_search, oob=True)
         
         return X_train, X_test, y_train, y_test
     
-    def evaluate_model(self, X_test, y_test, X_train, y_train):
-        """Comprehensive model evaluation"""
+    def _train_segments(self, X, y, param_grid, segment_by, progress_callback=None, max_workers=None):
+        """
+        Grid-search one forest per segment in a process pool
+        
+        Workers are capped by the number of segments and the available cores,
+        and the cores are divided between them so every search gets its share
+        without oversubscribing the machine. Returns a ``SegmentedForest``.
+        """
+        segment_names, segment_of_code = self._segment_lookup(segment_by)
+        route_column = SEGMENT_ROUTE_COLUMNS[segment_by]
+        row_segments = segment_of_code[X[route_column].to_numpy()]
+        
+        # Segments without training rows are dropped; their codes fall back at predict time
+        counts = np.bincount(row_segments[row_segments >= 0], minlength=len(segment_names))
+        trained = np.flatnonzero(counts)
+        remap = np.full(len(segment_names), -1, dtype=np.int16)
+        remap[trained] = np.arange(len(trained))
+        segment_of_code = np.where(segment_of_code >= 0, remap[segment_of_code], -1)
+        row_segments = np.where(row_segments >= 0, remap[row_segments], -1)
+        segment_names = [segment_names[i] for i in trained]
+        counts = counts[trained]
+        
+        cores = available_cores()
+        # Daemonic processes may not start children: search the segments in turn instead
+        in_daemon = multiprocessing.current_process().daemon
+        workers = 1 if in_daemon else min(len(segment_names), cores, max_workers or cores)
+        n_jobs = max(1, cores // workers)
+        
+        fits_total = len(ParameterGrid(param_grid)) * 5 * len(segment_names)
+        fits_done = 0
+        print(f"🧩 Training {len(segment_names)} {segment_by} models "
+              f"({workers} workers x {n_jobs} cores)...")
+        if progress_callback is not None:
+            progress_callback(fits_done, fits_total)
+        
+        tasks = [
+            (name, X[row_segments == index], y[row_segments == index], param_grid, n_jobs)
+            for index, name in enumerate(segment_names)
+        ]
+        if in_daemon:
+            completed = (_fit_segment(*task) for task in tasks)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            futures = [pool.submit(_fit_segment, *task) for task in tasks]
+            completed = (future.result() for future in as_completed(futures))
+        
+        results = {}
+        try:
+            for result in completed:
+                results[result['name']] = result
+                print(f"   ✅ {result['name']}: CV MAE {result['cv_mae_mean']:.3f}, "
+                      f"best parameters {result['best_params']}")
+                fits_done += result['n_fits']
+                if progress_callback is not None:
+                    progress_callback(fits_done, fits_total)
+        finally:
+            if not in_daemon:
+                pool.shutdown(cancel_futures=True)
+        
+        model = SegmentedForest(
+            segment_names,
+            [results[name]['model'] for name in segment_names],
+            route_column,
+            segment_of_code,
+            X.columns,
+            counts,
+            fallback=int(np.argmax(counts)),
+            best_params={name: results[name]['best_params'] for name in segment_names}
+        )
+        # Serve with all cores, as the single forest does
+        model.n_jobs = -1
+        
+        # Merge per-segment diagnostics back into training-row order for evaluate_model
+        segment_oob = [getattr(results[name]['model'], 'oob_prediction_', None) for name in segment_names]
+        if all(oob is not None for oob in segment_oob):
+            model.oob_prediction_ = np.zeros(len(X))
+            for index, oob in enumerate(segment_oob):
+                model.oob_prediction_[row_segments == index] = oob
+        model.cv_mae_mean_ = np.average([results[name]['cv_mae_mean'] for name in segment_names], weights=counts)
+        model.cv_mae_std_ = np.average([results[name]['cv_mae_std'] for name in segment_names], weights=counts)
+        
+        return model
+    
+    def _segment_lookup(self, segment_by):
+        """Segment names and a code -> segment index array for the encoded route column"""
+        if segment_by == 'district_category':
+            category_of = {
+                district: category
+                for category, districts in self.district_categories.items()
+                for district in districts
+            }
+            names = list(DISTRICT_CATEGORY_ORDER)
+            lookup = [
+                names.index(category_of[district]) if district in category_of else -1
+                for district in self.label_encoders['district'].classes_
+            ]
+        else:
+            names = list(self.label_encoders['program'].classes_)
+            lookup = range(len(names))
+        return names, np.asarray(lookup, dtype=np.int16)
+    
+    def evaluate_model(self, X_test, y_test, X_train, y_train, search=None, oob=False,
+                       permutation_repeats=0, permutation_max_samples=None):
+        """
+        Comprehensive model evaluation
+        
+        With a fitted ``search`` the cross-validation score is taken from its
+        ``cv_results_`` instead of refitting new forests. ``oob`` reports the
+        out-of-bag predictions, which only describe ``X_train`` when it is the
+        split the model was just fitted on (as in ``train_model``).
+        Permutation importance is computed only when ``permutation_repeats`` > 0,
+        in parallel and on at most ``permutation_max_samples`` test rows.
+        """
         print("\n📊 MODEL EVALUATION RESULTS")
         print("=" * 50)
         
-        # Predictions
+        # Predictions (one cached vector per split, shared by every metric)
         y_train_pred = self.model.predict(X_train)
         y_test_pred = self.model.predict(X_test)
         
-        # Training metrics
-        train_mae = mean_absolute_error(y_train, y_train_pred)
-        train_mse = mean_squared_error(y_train, y_train_pred)
-        train_r2 = r2_score(y_train, y_train_pred)
-        
-        # Testing metrics
-        test_mae = mean_absolute_error(y_test, y_test_pred)
-        test_mse = mean_squared_error(y_test, y_test_pred)
-        test_r2 = r2_score(y_test, y_test_pred)
+        train_metrics = self._regression_metrics(y_train, y_train_pred)
+        test_metrics = self._regression_metrics(y_test, y_test_pred)
+        train_mae, train_r2 = train_metrics['mae'], train_metrics['r2']
+        test_mae, test_r2 = test_metrics['mae'], test_metrics['r2']
         
         print(f"📈 TRAINING SET PERFORMANCE:")
-        print(f"   MAE: {train_mae:.3f}")
-        print(f"   MSE: {train_mse:.3f}")
-        print(f"   RMSE: {np.sqrt(train_mse):.3f}")
-        print(f"   R²: {train_r2:.3f}")
+        self._print_metrics(train_metrics)
         
         print(f"\n🎯 TESTING SET PERFORMANCE:")
-        print(f"   MAE: {test_mae:.3f}")
-        print(f"   MSE: {test_mse:.3f}")
-        print(f"   RMSE: {np.sqrt(test_mse):.3f}")
-        print(f"   R²: {test_r2:.3f}")
+        self._print_metrics(test_metrics)
+        
+        # Out-of-bag estimate from the bootstrap samples left out of each tree
+        oob_metrics = None
+        oob_prediction = getattr(self.model, 'oob_prediction_', None) if oob else None
+        if oob_prediction is not None and len(oob_prediction) == len(y_train):
+            oob_metrics = self._regression_metrics(y_train, oob_prediction)
+            print(f"\n🎒 OUT-OF-BAG PERFORMANCE:")
+            self._print_metrics(oob_metrics)
         
         # Cross-validation
-        cv_scores = cross_val_score(self.model, X_test, y_test, cv=5, scoring='neg_mean_absolute_error')
-        print(f"\n🔄 CROSS-VALIDATION (5-fold):")
-        print(f"   Mean MAE: {-cv_scores.mean():.3f} (±{cv_scores.std():.3f})")
+        if search is not None:
+            best = search.best_index_
+            cv_mae_mean = -search.cv_results_['mean_test_score'][best]
+            cv_mae_std = search.cv_results_['std_test_score'][best]
+            n_splits = search.n_splits_
+        elif getattr(self.model, 'cv_mae_mean_', None) is not None:
+            # Segmented models: row-weighted average of the per-segment searches
+            cv_mae_mean, cv_mae_std, n_splits = self.model.cv_mae_mean_, self.model.cv_mae_std_, 5
+        else:
+            cv_scores = cross_val_score(self.model, X_test, y_test, cv=5, scoring='neg_mean_absolute_error')
+            cv_mae_mean, cv_mae_std, n_splits = -cv_scores.mean(), cv_scores.std(), 5
+        print(f"\n🔄 CROSS-VALIDATION ({n_splits}-fold):")
+        print(f"   Mean MAE: {cv_mae_mean:.3f} (±{cv_mae_std:.3f})")
         
         # Feature importance
         feature_importance = pd.DataFrame({
@@ -337,6 +734,23 @@ class StudentRegistrationPredictor:
         for i, (idx, row) in enumerate(feature_importance.head(10).iterrows()):
             print(f"   {i+1:2d}. {row['feature']:<30} {row['importance']:.4f}")
         
+        permutation = None
+        if permutation_repeats > 0:
+            result = permutation_importance(
+                self.model, X_test, y_test, n_repeats=permutation_repeats,
+                scoring='neg_mean_absolute_error', max_samples=permutation_max_samples or 1.0,
+                n_jobs=-1, random_state=42
+            )
+            permutation = pd.DataFrame({
+                'feature': self.feature_columns,
+                'importance_mean': result.importances_mean,
+                'importance_std': result.importances_std
+            }).sort_values('importance_mean', ascending=False)
+            
+            print(f"\n🔀 TOP 10 FEATURES BY PERMUTATION IMPORTANCE (MAE increase):")
+            for i, (idx, row) in enumerate(permutation.head(10).iterrows()):
+                print(f"   {i+1:2d}. {row['feature']:<30} {row['importance_mean']:.4f}")
+        
         # Model performance assessment
         if test_r2 > 0.8:
             print(f"\n✅ EXCELLENT MODEL PERFORMANCE (R² = {test_r2:.3f})")
@@ -350,13 +764,53 @@ class StudentRegistrationPredictor:
         return {
             'train_mae': train_mae, 'test_mae': test_mae,
             'train_r2': train_r2, 'test_r2': test_r2,
-            'cv_mae_mean': -cv_scores.mean(),
-            'feature_importance': feature_importance
+            'oob_mae': oob_metrics['mae'] if oob_metrics else None,
+            'oob_r2': oob_metrics['r2'] if oob_metrics else None,
+            'cv_mae_mean': cv_mae_mean,
+            'cv_mae_std': cv_mae_std,
+            'feature_importance': feature_importance,
+            'permutation_importance': permutation
         }
     
+    def _regression_metrics(self, y_true, y_pred):
+        """MAE, MSE, RMSE and R² from a single prediction vector"""
+        mse = mean_squared_error(y_true, y_pred)
+        return {
+            'mae': mean_absolute_error(y_true, y_pred),
+            'mse': mse,
+            'rmse': np.sqrt(mse),
+            'r2': r2_score(y_true, y_pred)
+        }
+    
+    def _print_metrics(self, metrics):
+        print(f"   MAE: {metrics['mae']:.3f}")
+        print(f"   MSE: {metrics['mse']:.3f}")
+        print(f"   RMSE: {metrics['rmse']:.3f}")
+        print(f"   R²: {metrics['r2']:.3f}")
+    
     def predict_registrations(self, year=None, month=None):
         """
         Predict registrations for all districts for given year/month
+        
+        Returns labelled DataFrames; see ``predict_registrations_compact`` for
+        the underlying structured arrays.
+        """
+        detail, summary = self.predict_registrations_compact(year, month)
+        
+        pred_df = self.label_predictions(detail)
+        district_summary = self.label_predictions(summary).sort_values(
+            ['year', 'month', 'district']
+        ).reset_index(drop=True)
+        
+        return pred_df, district_summary
+    
+    def predict_registrations_compact(self, year=None, month=None):
+        """
+        Predict registrations as structured arrays of integer codes
+        
+        Returns ``(detail, summary)`` with dtypes ``PREDICTION_DTYPE`` and
+        ``DISTRICT_SUMMARY_DTYPE``; ``district``/``program`` fields index into
+        ``self.districts``/``self.programs``.
         """
         if not self.model:
             raise ValueError("Model not trained yet. Please train the model first.")
@@ -364,8 +818,7 @@ class StudentRegistrationPredictor:
         # Default to next year if not specified
         if year is None:
             year = datetime.now().year + 1
-        
-        predictions = []
+        self._validate_period(year, month)
         
         # If month is specified, predict for that month only
         if month is not None:
@@ -374,69 +827,182 @@ class StudentRegistrationPredictor:
             # Predict for all months of the year
             months_to_predict = list(range(1, 13))
         
-        for month_pred in months_to_predict:
-            for district in self.districts:
-                for program in self.programs:
-                    # Create feature vector
-                    features = {
-                        'year': year,
-                        'month': month_pred,
-                        'quarter': (month_pred - 1) // 3 + 1,
-                        'year_normalized': (year - 2020) / 5,
-                        'district': district,
-                        'program': program,
-                        'district_season_interaction': f"{district}_{month_pred}",
-                        'population_density': self._get_population_density(district),
-                        'urban_index': self._get_urban_index(district),
-                        'economic_index': self._get_economic_index(district),
-                        'is_peak_season': 1 if month_pred in [1, 2, 7, 8] else 0,
-                        'is_holiday_period': 1 if month_pred in [4, 12] else 0,
-                        'al_results_month': 1 if month_pred in [1, 8] else 0,
-                        'university_intake': 1 if month_pred in [2, 9] else 0,
-                        'covid_impact': 0,  # Assuming post-COVID era
-                        'economic_crisis': 0,  # Assuming recovery
-                        'competition_level': self._get_competition_level(district),
-                        'accessibility_score': self._get_accessibility_score(district)
-                    }
-                    
-                    # Calculate interaction features
-                    features['urban_population_interaction'] = features['urban_index'] * features['population_density']
-                    features['economic_seasonal_interaction'] = features['economic_index'] * features['is_peak_season']
-                    
-                    # Create DataFrame for prediction
-                    feature_df = pd.DataFrame([features])
-                    
-                    # Encode categorical features
-                    for col in ['district', 'program', 'district_season_interaction']:
-                        if col in self.label_encoders:
-                            try:
-                                feature_df[col + '_encoded'] = self.label_encoders[col].transform(feature_df[col])
-                            except ValueError:
-                                # Handle unseen categories
-                                feature_df[col + '_encoded'] = -1
-                        else:
-                            feature_df[col + '_encoded'] = 0
-                    
-                    # Select features
-                    X_pred = feature_df[self.feature_columns]
-                    
-                    # Make prediction
-                    pred_count = self.model.predict(X_pred)[0]
-                    pred_count = max(0, int(round(pred_count)))  # Ensure non-negative integer
-                    
-                    predictions.append({
-                        'year': year,
-                        'month': month_pred,
-                        'district': district,
-                        'program': program,
-                        'predicted_registrations': pred_count
-                    })
-        
-        # Aggregate by district
-        pred_df = pd.DataFrame(predictions)
-        district_summary = pred_df.groupby(['year', 'month', 'district'])['predicted_registrations'].sum().reset_index()
+        with profile_stage('build_frame'):
+            feature_df = self._build_prediction_frame(year, months_to_predict)
+        feature_df = self._prepare_prediction_features(feature_df)
         
-        return pred_df, district_summary
+        # Select features
+        X_pred = feature_df[self.feature_columns]
+        
+        # Make predictions, ensuring non-negative integers
+        with profile_stage('model_predict'):
+            pred_counts = np.clip(np.round(self.model.predict(X_pred)), 0, None).astype(np.int32)
+        
+        district_codes = feature_df['district'].cat.codes.to_numpy()
+        detail = np.empty(len(feature_df), dtype=PREDICTION_DTYPE)
+        detail['year'] = year
+        detail['month'] = feature_df['month'].to_numpy()
+        detail['district'] = district_codes
+        detail['program'] = feature_df['program'].cat.codes.to_numpy()
+        detail['predicted_registrations'] = pred_counts
+        
+        # Aggregate by month and district
+        with profile_stage('aggregate'):
+            n_districts = len(self.districts)
+            month_index = np.repeat(np.arange(len(months_to_predict)), n_districts * len(self.programs))
+            totals = np.bincount(
+                month_index * n_districts + district_codes, weights=pred_counts,
+                minlength=len(months_to_predict) * n_districts
+            )
+            summary = np.empty(len(totals), dtype=DISTRICT_SUMMARY_DTYPE)
+            summary['year'] = year
+            summary['month'] = np.repeat(months_to_predict, n_districts)
+            summary['district'] = np.tile(np.arange(n_districts), len(months_to_predict))
+            summary['predicted_registrations'] = totals
+        
+        return detail, summary
+    
+    def label_predictions(self, records):
+        """DataFrame from compact prediction records with district/program names attached"""
+        df = pd.DataFrame({name: records[name] for name in records.dtype.names})
+        df['district'] = np.asarray(self.districts, dtype=object)[records['district']]
+        if 'program' in df:
+            df['program'] = np.asarray(self.programs, dtype=object)[records['program']]
+        return df
+    
+    def predict_scenarios(self, scenarios, year=None, month=None):
+        """
+        Evaluate many what-if scenarios in a single model pass
+        
+        ``scenarios`` maps a scenario name to a dict of feature overrides. Flag
+        features (``covid_impact``, ``economic_crisis``, seasonal flags) take 0/1;
+        district features (``economic_index``, ``accessibility_score``, ...) take
+        either one value for every district or a ``{district: value}`` dict.
+        
+        Returns a per-district and a per-scenario DataFrame with deltas against
+        the unmodified baseline, which is always included as ``'baseline'``
+        (so that name cannot be used for a scenario).
+        """
+        if not self.model:
+            raise ValueError("Model not trained yet. Please train the model first.")
+        
+        if year is None:
+            year = datetime.now().year + 1
+        self._validate_period(year, month)
+        months_to_predict = [month] if month is not None else list(range(1, 13))
+        
+        if 'baseline' in scenarios:
+            raise ValueError("Scenario name 'baseline' is reserved for the unmodified prediction")
+        scenario_names = ['baseline'] + list(scenarios)
+        for name in scenario_names[1:]:
+            self._validate_scenario(name, scenarios[name])
+        
+        # All scenarios share the same base rows so deltas reflect only the overrides
+        with profile_stage('build_frame'):
+            base_df = self._build_prediction_frame(year, months_to_predict)
+        n_rows = len(base_df)
+        stacked = pd.concat([base_df] * len(scenario_names), ignore_index=True)
+        stacked['scenario'] = np.repeat(scenario_names, n_rows)
+        
+        districts = base_df['district'].values
+        for i, name in enumerate(scenario_names[1:], start=1):
+            block = slice(i * n_rows, (i + 1) * n_rows)
+            for feature, value in scenarios[name].items():
+                column = stacked[feature].values.copy()
+                if isinstance(value, dict):
+                    base_values = column[block]
+                    column[block] = [value.get(d, v) for d, v in zip(districts, base_values)]
+                else:
+                    column[block] = value
+                stacked[feature] = column
+        
+        stacked = self._prepare_prediction_features(stacked)
+        with profile_stage('model_predict'):
+            pred_counts = np.clip(np.round(self.model.predict(stacked[self.feature_columns])), 0, None).astype(np.int32)
+        stacked['predicted_registrations'] = pred_counts
+        
+        with profile_stage('groupby'):
+            district_results = stacked.groupby(
+                ['scenario', 'district'], sort=False, observed=True
+            )['predicted_registrations'].sum().reset_index()
+        baseline = district_results[district_results['scenario'] == 'baseline'].set_index('district')['predicted_registrations']
+        # Mapping a categorical column stays categorical when the values are unique; take plain counts
+        district_results['baseline_registrations'] = district_results['district'].map(baseline).astype(np.int64).values
+        district_results['delta'] = district_results['predicted_registrations'] - district_results['baseline_registrations']
+        
+        scenario_summary = district_results.groupby('scenario', sort=False)[
+            ['predicted_registrations', 'baseline_registrations', 'delta']
+        ].sum().reset_index()
+        scenario_summary['delta_pct'] = np.where(
+            scenario_summary['baseline_registrations'] > 0,
+            scenario_summary['delta'] / scenario_summary['baseline_registrations'].clip(lower=1) * 100,
+            0.0
+        ).round(1)
+        
+        return district_results, scenario_summary
+    
+    def _validate_period(self, year, month):
+        """Reject periods the compact frames cannot represent"""
+        low, high = PREDICTION_YEAR_RANGE
+        if not low <= year <= high:
+            raise ValueError(f"Year must be between {low} and {high}, got {year}")
+        if month is not None and not 1 <= month <= 12:
+            raise ValueError(f"Month must be between 1 and 12, got {month}")
+    
+    def _validate_scenario(self, name, overrides):
+        """Reject overrides that do not map onto scenario-adjustable features"""
+        if not isinstance(overrides, dict):
+            raise ValueError(f"Scenario '{name}' must be a dict of feature overrides")
+        for feature, value in overrides.items():
+            if feature in SCENARIO_FLAG_FEATURES:
+                if value not in (0, 1):
+                    raise ValueError(f"Scenario '{name}': '{feature}' must be 0 or 1")
+            elif feature in SCENARIO_DISTRICT_FEATURES:
+                if isinstance(value, dict):
+                    unknown = set(value) - set(self.districts)
+                    if unknown:
+                        raise ValueError(f"Scenario '{name}': unknown districts {sorted(unknown)}")
+            else:
+                raise ValueError(f"Scenario '{name}': '{feature}' cannot be overridden")
+    
+    def _build_prediction_frame(self, year, months_to_predict):
+        """Raw feature rows for every month/district/program combination"""
+        n_districts, n_programs = len(self.districts), len(self.programs)
+        months = np.asarray(months_to_predict, dtype=np.int8)
+        
+        return self._build_feature_frame(
+            year,
+            np.repeat(months, n_districts * n_programs),
+            np.tile(np.repeat(np.arange(n_districts), n_programs), len(months)),
+            np.tile(np.arange(n_programs), len(months) * n_districts),
+            covid_impact=0,  # Assuming post-COVID era
+            economic_crisis=0,  # Assuming recovery
+            noise=False  # Same request, same prediction
+        )
+    
+    def _prepare_prediction_features(self, feature_df):
+        """Add interaction and encoded columns to a prediction frame"""
+        # Calculate interaction features
+        self._add_interaction_features(feature_df)
+        
+        # Encode categorical features
+        with profile_stage('encode'):
+            for col in ['district', 'program', 'district_season_interaction']:
+                feature_df[col + '_encoded'] = self._encode_column(col, feature_df[col])
+        
+        return feature_df
+    
+    def _encode_column(self, col, values):
+        """Label-encode a column, mapping categories unseen during training to -1"""
+        if col not in self.label_encoders:
+            return np.zeros(len(values), dtype=np.int16)
+        classes = pd.Index(self.label_encoders[col].classes_)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Encode each category once, then gather by category code
+            lookup = classes.get_indexer(values.cat.categories)
+            codes = values.cat.codes.to_numpy()
+            return np.where(codes >= 0, lookup[codes], -1).astype(np.int16)
+        return classes.get_indexer(values).astype(np.int16)
     
     def save_model(self, filepath='student_registration_model.pkl'):
         """Save trained model and encoders"""
@@ -447,23 +1013,44 @@ class StudentRegistrationPredictor:
             'districts': self.districts,
             'programs': self.programs
         }
+        if isinstance(self.model, SegmentedForest):
+            # Stored as plain forests and arrays, independent of this module's import path
+            model_data['model'] = None
+            model_data['segments'] = self.model.to_state()
         
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
+        payload = pickle.dumps(model_data)
         
+        # Write next to the target and rename, so readers never see a partial artifact
+        tmp_path = f"{filepath}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        self.model_fingerprint = hashlib.sha256(payload).hexdigest()[:16]
         print(f"✅ Model saved to {filepath}")
     
     def load_model(self, filepath='student_registration_model.pkl'):
         """Load trained model and encoders"""
         with open(filepath, 'rb') as f:
-            model_data = pickle.load(f)
+            payload = f.read()
+        model_data = pickle.loads(payload)
         
         self.model = model_data['model']
+        if model_data.get('segments'):
+            self.model = SegmentedForest.from_state(model_data['segments'])
         self.feature_columns = model_data['feature_columns']
         self.label_encoders = model_data['label_encoders']
         self.districts = model_data['districts']
         self.programs = model_data['programs']
         
+        # Content hash of the artifact, used to tell whether derived outputs are stale
+        self.model_fingerprint = hashlib.sha256(payload).hexdigest()[:16]
+        
         print(f"✅ Model loaded from {filepath}")
 
 
@@ -0,0 +1,50 @@
+"""
+Regression tests for what-if scenario predictions
+"""
+
+import numpy as np
+import pytest
+
+from student_registration_prediction_system import StudentRegistrationPredictor
+
+
+class DistrictCodeModel:
+    """Predicts a distinct count per district, so baseline totals never repeat"""
+
+    def predict(self, X):
+        return X['district_encoded'].to_numpy() + 1 + X['economic_crisis'].to_numpy()
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    predictor = StudentRegistrationPredictor()
+    df = predictor.generate_synthetic_data(2, 30)
+    predictor.prepare_features(df)
+    predictor.model = DistrictCodeModel()
+    return predictor
+
+
+def test_yearly_scenarios_compare_against_baseline(predictor):
+    district_results, summary = predictor.predict_scenarios({'crisis': {'economic_crisis': 1}}, 2026)
+
+    assert district_results['baseline_registrations'].dtype == np.int64
+    baseline = district_results[district_results['scenario'] == 'baseline']
+    crisis = district_results[district_results['scenario'] == 'crisis']
+    assert (baseline['delta'] == 0).all()
+    assert (crisis['delta'] > 0).all()
+
+    totals = summary.set_index('scenario')
+    assert totals.loc['crisis', 'delta'] == crisis['delta'].sum()
+    assert totals.loc['crisis', 'baseline_registrations'] == totals.loc['baseline', 'predicted_registrations']
+
+
+def test_monthly_scenarios_compare_against_baseline(predictor):
+    district_results, _ = predictor.predict_scenarios({'crisis': {'economic_crisis': 1}}, 2026, 6)
+
+    crisis = district_results[district_results['scenario'] == 'crisis']
+    assert (crisis['delta'] > 0).all()
+
+
+def test_baseline_scenario_name_is_reserved(predictor):
+    with pytest.raises(ValueError):
+        predictor.predict_scenarios({'baseline': {'economic_crisis': 1}}, 2026)
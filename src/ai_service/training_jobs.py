@@ -0,0 +1,274 @@
+"""
+Background training jobs for the prediction API
+
+Each job trains a model in a separate, lower-priority process so the serving
+process is never starved. The child streams structured progress (grid-search
+fits done / total) back over a queue, the artifact is written atomically to
+``<models_dir>/<version>.pkl``, and on success the new version can be promoted
+to serve unpinned traffic.
+"""
+
+import atexit
+import glob
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime
+
+# Terminal job states
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+
+def _run_training_job(events, config):
+    """Child process entry point: generate data, train, save and report"""
+    from student_registration_prediction_system import StudentRegistrationPredictor
+
+    try:
+        # Own process group, so cancelling also stops the joblib/process pool workers we start
+        os.setsid()
+    except (AttributeError, OSError):
+        pass
+
+    try:
+        # Yield the CPU to the serving process when both compete for it
+        os.nice(config.get('niceness', 10))
+    except (AttributeError, OSError):
+        pass
+
+    try:
+        predictor = StudentRegistrationPredictor()
+        events.put({'type': 'stage', 'stage': 'generating_data'})
+        df = predictor.generate_synthetic_data(
+            years=config['years'], records_per_month=config['records_per_month']
+        )
+        events.put({'type': 'stage', 'stage': 'preparing_features'})
+        X, y = predictor.prepare_features(df)
+
+        def report(fits_done, fits_total):
+            events.put({'type': 'progress', 'fits_done': fits_done, 'fits_total': fits_total})
+
+        events.put({'type': 'stage', 'stage': 'training'})
+        predictor.train_model(
+            X, y, param_grid=config.get('param_grid'), progress_callback=report,
+            segment_by=config.get('segment_by')
+        )
+
+        events.put({'type': 'stage', 'stage': 'saving'})
+        predictor.save_model(config['artifact_path'])
+
+        metrics = {
+            key: float(value) for key, value in (predictor.metrics or {}).items()
+            if isinstance(value, (int, float))
+        }
+        events.put({
+            'type': 'done',
+            'fingerprint': predictor.model_fingerprint,
+            'metrics': metrics,
+        })
+    except Exception as e:
+        events.put({'type': 'error', 'error': str(e), 'traceback': traceback.format_exc()})
+
+
+def _kill_process_tree(process, timeout=5):
+    """Stop a training process and every worker in its process group"""
+    if process.pid is None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # No group yet (or no killpg on this platform): only the child exists
+        process.terminate()
+    process.join(timeout)
+    try:
+        # Workers that outlived the child, or anything ignoring SIGTERM
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        if process.is_alive():
+            process.kill()
+    process.join(timeout)
+
+
+class TrainingJob:
+    """State of one background training run"""
+
+    def __init__(self, job_id, version, config, promote):
+        self.id = job_id
+        self.version = version
+        self.config = config
+        self.promote = promote
+        self.status = 'queued'
+        self.stage = None
+        self.fits_done = 0
+        self.fits_total = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.fingerprint = None
+        self.metrics = None
+        self.promoted = False
+        self.error = None
+        self.process = None
+        self._training_started = None
+
+    @property
+    def eta_seconds(self):
+        """Linear estimate of the remaining grid-search time"""
+        if self.status != 'running' or not self.fits_total or not self.fits_done:
+            return None
+        elapsed = time.monotonic() - self._training_started
+        return round(elapsed / self.fits_done * (self.fits_total - self.fits_done), 1)
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'version': self.version,
+            'status': self.status,
+            'stage': self.stage,
+            'fits_done': self.fits_done,
+            'fits_total': self.fits_total,
+            'eta_seconds': self.eta_seconds,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'artifact_path': self.config['artifact_path'],
+            'fingerprint': self.fingerprint,
+            'metrics': self.metrics,
+            'promote': self.promote,
+            'promoted': self.promoted,
+            'error': self.error,
+        }
+
+
+class TrainingJobManager:
+    """Starts, tracks and cancels training processes; one runs at a time"""
+
+    def __init__(self, registry, models_dir=None, on_promote=None):
+        self.registry = registry
+        self.models_dir = models_dir or registry.models_dir
+        self.on_promote = on_promote
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Spawn rather than fork: the server process holds threads and loaded models
+        self._context = multiprocessing.get_context('spawn')
+        # Training processes are not daemonic (joblib and process pools need children),
+        # so stop them before multiprocessing's exit handler would wait for them
+        atexit.register(self.shutdown)
+
+    def start(self, years=5, records_per_month=100, version=None, promote=False, param_grid=None,
+              segment_by=None):
+        """Launch a training process and return its job"""
+        with self._lock:
+            if any(job.status in ('queued', 'running') for job in self._jobs.values()):
+                raise RuntimeError("A training job is already running")
+
+            job_id = next(self._ids)
+            version = version or f"v{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            if version in self.registry.artifacts:
+                raise ValueError(f"Model version '{version}' already exists")
+
+            os.makedirs(self.models_dir, exist_ok=True)
+            config = {
+                'years': years,
+                'records_per_month': records_per_month,
+                'param_grid': param_grid,
+                'segment_by': segment_by,
+                'artifact_path': os.path.join(self.models_dir, f"{version}.pkl"),
+            }
+            job = TrainingJob(job_id, version, config, promote)
+            self._jobs[job_id] = job
+
+        events = self._context.Queue()
+        # Not a daemon: daemonic processes may not start the workers training relies on
+        job.process = self._context.Process(target=_run_training_job, args=(events, config))
+        job.process.start()
+        job.status = 'running'
+        job.started_at = datetime.now().isoformat()
+        job._training_started = time.monotonic()
+
+        threading.Thread(target=self._monitor, args=(job, events), daemon=True).start()
+        return job
+
+    def _monitor(self, job, events):
+        """Apply child events to the job until the process exits"""
+        while True:
+            try:
+                event = events.get(timeout=0.5)
+            except queue.Empty:
+                if not job.process.is_alive():
+                    break
+                continue
+
+            if event['type'] == 'stage':
+                job.stage = event['stage']
+                if event['stage'] == 'training':
+                    job._training_started = time.monotonic()
+            elif event['type'] == 'progress':
+                job.fits_done = event['fits_done']
+                job.fits_total = event['fits_total']
+            elif event['type'] == 'done':
+                job.fingerprint = event['fingerprint']
+                job.metrics = event['metrics']
+                self._finish(job, 'succeeded')
+                break
+            elif event['type'] == 'error':
+                job.error = event['error']
+                self._finish(job, 'failed')
+                break
+
+        job.process.join()
+        if job.status not in FINISHED_STATES:
+            job.error = f"Training process exited with code {job.process.exitcode}"
+            self._finish(job, 'failed')
+
+    def _finish(self, job, status):
+        if job.status in FINISHED_STATES:
+            return
+        if status == 'succeeded':
+            self.registry.discover()
+            if job.promote:
+                try:
+                    self.registry.set_default(job.version)
+                    job.promoted = True
+                    if self.on_promote is not None:
+                        self.on_promote(job.version)
+                except Exception as e:
+                    job.error = f"Promotion failed: {e}"
+        job.status = status
+        job.finished_at = datetime.now().isoformat()
+
+    def cancel(self, job_id):
+        """Stop a running job and its workers, removing any half-written artifact"""
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown training job {job_id}")
+        if job.status in FINISHED_STATES:
+            return job
+        job.status = 'cancelled'
+        job.finished_at = datetime.now().isoformat()
+        if job.process is not None:
+            _kill_process_tree(job.process)
+        # Temp file of an interrupted atomic save (<artifact>.<pid>.tmp)
+        for tmp_path in glob.glob(glob.escape(job.config['artifact_path']) + '.*.tmp'):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return job
+
+    def shutdown(self):
+        """Cancel every unfinished job (called on server shutdown)"""
+        for job in list(self._jobs.values()):
+            if job.status not in FINISHED_STATES:
+                self.cancel(job.id)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return [job.as_dict() for job in sorted(self._jobs.values(), key=lambda j: j.id, reverse=True)]
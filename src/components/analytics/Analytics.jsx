@@ -801,7 +801,10 @@ const Analytics = () => {
                         borderColor: (theme) => alpha(theme.palette.primary.main, 0.1),
                       }}
                     >
-                    <SriLankaMap predictions={predictions} />
+                    <SriLankaMap
+                      year={selectedDate.getFullYear()}
+                      month={selectedDate.getMonth() + 1}
+                    />
                     </Box>
                   </CardContent>
                 </Card>
@@ -1,4 +1,4 @@
-import React from "react";
+import React, { useEffect, useState } from "react";
 import { Box, Typography, Paper } from "@mui/material";
 import {
   MapContainer,
@@ -9,7 +9,7 @@ import {
 } from "react-leaflet";
 import "leaflet/dist/leaflet.css";
 import "../../utils/leaflet-icons-fix";
-import sriLankaGeoData from "./sri-lanka-districts.json";
+import { fetchMapData } from "../../lib/api/ai_predictions";
 import { styled } from "@mui/material/styles";
 
 const MapBox = styled(Box)(({ theme }) => ({
@@ -36,33 +36,33 @@ const Legend = styled(Box)(({ theme }) => ({
   boxShadow: theme.shadows[2],
 }));
 
-const SriLankaMap = ({ predictions }) => {
-  if (!predictions || !predictions.districts || !predictions.predictions) {
-    return null;
-  }
+const SriLankaMap = ({ year, month }) => {
+  const [mapData, setMapData] = useState(null);
 
-  // Create a map of district names to their predictions
-  const predictionMap = predictions.districts.reduce((acc, district, index) => {
-    acc[district] = predictions.predictions[index];
-    return acc;
-  }, {});
-
-  // Get min and max predictions for color scale
-  const minPrediction = Math.min(...predictions.predictions);
-  const maxPrediction = Math.max(...predictions.predictions);
+  // Predictions arrive already joined onto the district geometry and binned
+  useEffect(() => {
+    if (!year) return;
+    let cancelled = false;
+    fetchMapData(year, month)
+      .then((data) => {
+        if (!cancelled) setMapData(data);
+      })
+      .catch(() => {
+        if (!cancelled) setMapData(null);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [year, month]);
 
-  // Color scale function
-  const getColor = (value) => {
-    const normalizedValue =
-      (value - minPrediction) / (maxPrediction - minPrediction);
-    return `hsl(200, 80%, ${100 - normalizedValue * 50}%)`;
-  };
+  if (!mapData || !mapData.features) {
+    return null;
+  }
 
   // Style function for GeoJSON features
   const style = (feature) => {
-    const prediction = predictionMap[feature.properties.name] || 0;
     return {
-      fillColor: getColor(prediction),
+      fillColor: feature.properties.fill_color,
       weight: 2,
       opacity: 1,
       color: "white",
@@ -90,7 +90,7 @@ const SriLankaMap = ({ predictions }) => {
 
   // Click handler
   const onEachFeature = (feature, layer) => {
-    const prediction = predictionMap[feature.properties.name] || 0;
+    const prediction = feature.properties.predicted_registrations;
     layer.bindTooltip(
       `<div>
         <strong>${feature.properties.name}</strong><br/>
@@ -105,15 +105,11 @@ const SriLankaMap = ({ predictions }) => {
     });
   };
 
-  // Generate legend items
-  const legendItems = [
-    { label: `${Math.round(minPrediction)}`, color: getColor(minPrediction) },
-    {
-      label: `${Math.round((minPrediction + maxPrediction) / 2)}`,
-      color: getColor((minPrediction + maxPrediction) / 2),
-    },
-    { label: `${Math.round(maxPrediction)}`, color: getColor(maxPrediction) },
-  ];
+  // Legend bins come with the map payload
+  const legendItems = mapData.legend.map((item) => ({
+    label: item.min === item.max ? `${item.min}` : `${item.min} - ${item.max}`,
+    color: item.color,
+  }));
 
   return (
     <Paper elevation={3} sx={{ p: 2, position: "relative" }}>
@@ -143,7 +139,8 @@ const SriLankaMap = ({ predictions }) => {
             </LayersControl.BaseLayer>
           </LayersControl>
           <GeoJSON
-            data={sriLankaGeoData}
+            key={`${mapData.period.year}-${mapData.period.month}-${mapData.timestamp}`}
+            data={mapData}
             style={style}
             onEachFeature={onEachFeature}
           />
@@ -4,13 +4,9 @@ const API_BASE_URL =
 // Export the fetchPredictions function directly
 export const fetchPredictions = async (year, month) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/predict`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({ year, month }),
-    });
+    // GET lets the browser revalidate with If-None-Match and reuse unchanged results
+    const params = new URLSearchParams({ year, month });
+    const response = await fetch(`${API_BASE_URL}/predict?${params}`);
 
     if (!response.ok) {
       const error = await response.json();
@@ -24,6 +20,25 @@ export const fetchPredictions = async (year, month) => {
   }
 };
 
+// Pre-joined, pre-binned district map (GeoJSON with fill colours and legend)
+export const fetchMapData = async (year, month) => {
+  try {
+    const params = new URLSearchParams({ year });
+    if (month) params.append("month", month);
+    const response = await fetch(`${API_BASE_URL}/map?${params}`);
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || "Failed to fetch map data");
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error("Map data error:", error);
+    throw error;
+  }
+};
+
 // Export other API functions as part of aiService object
 export const aiService = {
   // Get model metrics